@@ -0,0 +1,127 @@
+"""End-to-end benchmark of WindowManager + BSPTilingStrategy on a SimulatedDesktop.
+
+Run from the repository root (config.ini is read from the working directory):
+
+    python -m benchmarks.desktop_benchmark [window_count ...]
+"""
+import random
+import sys
+import time
+
+import wimpy.config as config
+import wimpy.win32 as win32
+
+from wimpy.BSPTilingStrategy import BSPTilingStrategy
+from wimpy.SimulatedDesktop import SimulatedDesktop
+from wimpy.WindowManager import WindowManager
+from wimpy.WindowTracker import WindowTracker
+
+MONITORS = ((0, 0, 2560, 1440), (2560, 0, 4480, 1080))
+
+
+def _random_rect(rng, monitor):
+    l, t, r, b = monitor
+    width = rng.randint(300, (r - l) // 2)
+    height = rng.randint(200, (b - t) // 2)
+    x = rng.randint(l, r - width)
+    y = rng.randint(t, b - height)
+    return (x, y, x + width, y + height)
+
+
+class Scenario(object):
+
+    def __init__(self, desktop, manager):
+        self.desktop = desktop
+        self.manager = manager
+
+    def run(self, label, action):
+        """runs action, delivers the resulting events and relayouts, reports time and native calls"""
+        calls = self.desktop.calls.copy()
+        start = time.perf_counter()
+        action()
+        events = 0
+        # relayout moves cause further events, settle until quiet
+        while True:
+            delivered = self.desktop.pump()
+            self.manager.worker.run_pending()
+            self.manager.scheduler.flush()
+            # there is no time for echoes to expire, check the moved windows at once
+            self.manager.flush_echoes()
+            events += delivered
+            if delivered == 0 and len(self.desktop.pending_events) == 0:
+                break
+        elapsed = time.perf_counter() - start
+        delta = self.desktop.calls - calls
+        print(f"  {label:<28}{elapsed * 1000:>10.2f} ms{events:>8} events"
+              f"{sum(delta.values()):>8} calls"
+              f"{delta['SetWindowPos'] + delta['DeferWindowPositions']:>6} placements")
+
+
+def run(window_count, seed=0):
+    rng = random.Random(seed)
+    desktop = SimulatedDesktop(MONITORS)
+    win32.set_backend(desktop)
+
+    hwnds = [desktop.create_window(_random_rect(rng, rng.choice(MONITORS)), f"Window {i}")
+             for i in range(window_count)]
+    desktop.pending_events.clear()
+
+    print(f"{window_count} windows on {len(MONITORS)} monitors")
+    start = time.perf_counter()
+    manager = WindowManager(WindowTracker(), BSPTilingStrategy())
+    # events and relayouts are run explicitly instead of by the worker thread
+    manager.stop()
+    print(f"  {'startup':<28}{(time.perf_counter() - start) * 1000:>10.2f} ms"
+          f"{'':>15}{sum(desktop.calls.values()):>8} calls")
+    hook = desktop.SetWinEventHook(win32.EVENT_MIN, win32.EVENT_MAX,
+                            manager.on_event, None)
+
+    scenario = Scenario(desktop, manager)
+    scenario.run("settle initial layout", lambda: None)
+    scenario.run("open window", lambda: hwnds.append(
+        desktop.create_window(_random_rect(rng, MONITORS[0]))))
+    scenario.run("open 5 windows at once", lambda: [hwnds.append(
+        desktop.create_window(_random_rect(rng, MONITORS[0]))) for _ in range(5)])
+    scenario.run("close window", lambda: desktop.destroy_window(hwnds.pop()))
+    scenario.run("user moves window", lambda: desktop.move_window(
+        hwnds[0], _random_rect(rng, MONITORS[1])))
+    scenario.run("minimize + restore", lambda: (desktop.minimize_window(
+        hwnds[1]), desktop.restore_window(hwnds[1])))
+    scenario.run("rename window", lambda: desktop.set_title(hwnds[2], "renamed"))
+    scenario.run("manual refresh", manager.refresh)
+    scenario.run("background sweep", manager.sweep)
+
+    def missed_events():
+        hwnds.append(desktop.create_window(_random_rect(rng, MONITORS[0])))
+        desktop.destroy_window(hwnds.pop(6))
+        desktop.pending_events.clear()
+        manager.sweep()
+    scenario.run("sweep after missed events", missed_events)
+    desktop.constrain_window(hwnds[4], min_size=(1400, 900))
+    scenario.run("window enforcing min size", lambda: desktop.move_window(
+        hwnds[4], _random_rect(rng, MONITORS[0])))
+    desktop.constrain_window(hwnds[5], grid=(9, 19))
+    scenario.run("window snapping to a grid", lambda: desktop.move_window(
+        hwnds[5], _random_rect(rng, MONITORS[0])))
+    desktop.hang_window(hwnds[3])
+    scenario.run("open window next to hung", lambda: hwnds.append(
+        desktop.create_window(_random_rect(rng, MONITORS[0]))))
+    print(f"  {desktop.blocked_calls} call(s) would have blocked on the hung window")
+
+    # restart with the session the first manager would save on exit
+    state = manager.session_state()
+    desktop.UnhookWinEvent(hook)
+    calls = desktop.calls.copy()
+    start = time.perf_counter()
+    WindowManager(WindowTracker(), BSPTilingStrategy(), state).stop()
+    delta = desktop.calls - calls
+    print(f"  {'restart from session':<28}{(time.perf_counter() - start) * 1000:>10.2f} ms"
+          f"{'':>8}{sum(delta.values()):>15} calls"
+          f"{delta['SetWindowPos'] + delta['DeferWindowPositions']:>6} placements")
+
+
+if __name__ == "__main__":
+    config.load_file("config.ini")
+    counts = [int(c) for c in sys.argv[1:]] or [10, 100, 500]
+    for count in counts:
+        run(count)
@@ -0,0 +1,81 @@
+"""Micro-benchmark of tracked window lookups: list scans vs WindowRegistry.
+
+Run from the repository root:
+
+    python -m benchmarks.registry_benchmark [window_count]
+"""
+import random
+import sys
+import timeit
+
+from wimpy.WindowRegistry import WindowRegistry
+
+
+class SyntheticWindow(object):
+
+    def __init__(self, hwnd):
+        self.hwnd = hwnd
+
+
+def _list_lookup(handles, windows, hwnd):
+    if hwnd not in handles:
+        return None
+    for w in windows:
+        if w.hwnd == hwnd:
+            return w
+    return None
+
+
+def _list_remove(handles, windows, hwnd):
+    handles.remove(hwnd)
+    return list(filter(lambda w: w.hwnd != hwnd, windows))
+
+
+def _list_diff(tracked, enumerated):
+    added = [h for h in enumerated if h not in tracked]
+    removed = [h for h in tracked if h not in enumerated]
+    return added, removed
+
+
+def _registry_diff(registry, enumerated):
+    enumerated = set(enumerated)
+    tracked = registry.handles()
+    return enumerated - tracked, tracked - enumerated
+
+
+def run(window_count, number=200):
+    rng = random.Random(0)
+    handles = rng.sample(range(0x10000, 0x10000000), window_count)
+    windows = [SyntheticWindow(h) for h in handles]
+    probes = [rng.choice(handles) for _ in range(window_count)]
+
+    registry = WindowRegistry()
+    for w in windows:
+        registry.add(w, display_hwnd=w.hwnd % 3)
+
+    # simulate one enumeration with 10% of windows replaced
+    churn = window_count // 10
+    enumerated = handles[churn:] + \
+        rng.sample(range(0x10000000, 0x20000000), churn)
+
+    results = [
+        ("lookup (list)", lambda: [_list_lookup(
+            handles, windows, h) for h in probes]),
+        ("lookup (registry)", lambda: [registry.get(h) for h in probes]),
+        ("insert+remove (list)", lambda: _list_remove(
+            handles + [1], windows + [SyntheticWindow(1)], 1)),
+        ("insert+remove (registry)", lambda: (registry.add(
+            SyntheticWindow(1), display_hwnd=0), registry.remove(1))),
+        ("enumeration diff (list)", lambda: _list_diff(handles, enumerated)),
+        ("enumeration diff (registry)",
+         lambda: _registry_diff(registry, enumerated)),
+    ]
+
+    print(f"{window_count} synthetic windows, {number} iterations")
+    for label, func in results:
+        seconds = timeit.timeit(func, number=number)
+        print(f"  {label:<30}{seconds / number * 1e6:>12.1f} us")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,122 @@
+"""Replays a trace recorded with `main.py --record-trace` into WindowManager on a SimulatedDesktop.
+
+Run from the repository root (config.ini is read from the working directory):
+
+    python -m benchmarks.replay_trace trace.bin [--realtime]
+
+By default events are replayed as fast as possible. Relayouts are still scheduled
+on the trace's clock, so coalescing behaves as it did when the trace was recorded.
+"""
+import argparse
+import time
+
+import wimpy.config as config
+import wimpy.win32 as win32
+
+from wimpy.BSPTilingStrategy import BSPTilingStrategy
+from wimpy.SimulatedDesktop import SimulatedDesktop
+from wimpy.WindowManager import WindowManager
+from wimpy.WindowTracker import WindowTracker
+from wimpy.WinEventTrace import *
+
+
+def _build_desktop(records):
+    """creates a SimulatedDesktop from the snapshots preceding the first event"""
+    monitors = {}
+    work_areas = {}
+    windows = []
+    for kind, timestamp, hwnd, fields in records:
+        if kind == KIND_EVENT:
+            break
+        elif kind == KIND_MONITOR:
+            monitors[hwnd] = tuple(fields[:4])
+        elif kind == KIND_WORK_AREA:
+            work_areas[hwnd] = tuple(fields[:4])
+        elif kind == KIND_WINDOW:
+            windows.append((hwnd, fields))
+
+    hmonitors = list(monitors.keys())
+    desktop = SimulatedDesktop([monitors[h] for h in hmonitors],
+                               work_areas=[work_areas[h] for h in hmonitors])
+    # EnumWindows lists the topmost window first, create bottom to top
+    for hwnd, (l, t, r, b, style, exstyle) in reversed(windows):
+        desktop.create_window((l, t, r, b), style=style,
+                              exstyle=exstyle, hwnd=hwnd)
+    desktop.pending_events.clear()
+    return desktop
+
+
+def _apply_snapshot(desktop, hwnd, fields):
+    l, t, r, b, style, exstyle = fields
+    if hwnd in desktop.windows:
+        desktop.set_window_state(hwnd, (l, t, r, b), style, exstyle)
+    else:
+        desktop.create_window((l, t, r, b), style=style,
+                              exstyle=exstyle, hwnd=hwnd)
+
+
+def replay(path, realtime=False):
+    records = list(read_trace(path))
+    desktop = _build_desktop(records)
+    win32.set_backend(desktop)
+
+    now = [0.0]
+    manager = WindowManager(WindowTracker(), BSPTilingStrategy())
+    # events run on this thread, relayouts on the trace's clock instead of the worker's timers
+    manager.stop()
+    manager.scheduler.clock = lambda: now[0]
+    calls = desktop.calls.copy()
+
+    def _dispatch(timestamp, hwnd, fields):
+        event, id_object, id_child, _, thread, event_time = fields
+        now[0] = timestamp / 1000000
+        if realtime:
+            delay = start + now[0] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        manager.scheduler.run_due()
+        if event == win32.EVENT_OBJECT_DESTROY and hwnd in desktop.windows:
+            desktop.destroy_window(hwnd)
+        # the trace already contains the events caused by our own moves
+        desktop.pending_events.clear()
+        manager.on_event(0, event, hwnd, id_object,
+                         id_child, thread, event_time)
+        manager.worker.run_pending()
+        manager.scheduler.run_due()
+
+    events = 0
+    pending = None
+    start = time.perf_counter()
+    for kind, timestamp, hwnd, fields in records:
+        if kind == KIND_WINDOW:
+            _apply_snapshot(desktop, hwnd, fields)
+        elif kind == KIND_EVENT:
+            # an event is dispatched once the snapshots following it were applied
+            if pending is not None:
+                _dispatch(*pending)
+            pending = (timestamp, hwnd, fields)
+            events += 1
+    if pending is not None:
+        _dispatch(*pending)
+    manager.scheduler.flush()
+    elapsed = time.perf_counter() - start
+
+    delta = desktop.calls - calls
+    scheduler = manager.scheduler
+    print(f"replayed {events} event(s) in {elapsed * 1000:.2f} ms "
+          f"({elapsed / max(events, 1) * 1000000:.1f} us/event)")
+    print(f"  {scheduler.relayouts} relayout(s), {scheduler.events_coalesced} event(s) coalesced")
+    print(f"  {sum(delta.values())} native call(s)")
+    for name, count in delta.most_common():
+        print(f"    {name:<24}{count:>8}")
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("path")
+    argparser.add_argument("--realtime", action="store_true",
+                           help="Replays events with their original timing.")
+    args = argparser.parse_args()
+
+    config.load_file("config.ini")
+    replay(args.path, args.realtime)
@@ -0,0 +1,162 @@
+"""Benchmark of BSPTilingStrategy layouts on synthetic displays and windows.
+
+Needs neither Windows nor a simulated desktop: the strategy only reads display_size,
+topmost and hwnd of the windows, the placements it plans are applied to them here.
+For every window count, starting layout and split ratio it reports the compute
+time of one plan, the moves it issues and their displacement, the sum of how
+far every edge of the moved windows travels, in pixels.
+
+Run from the repository root (config.ini is read from the working directory):
+
+    python -m benchmarks.strategy_benchmark [window_count ...]
+"""
+import random
+import sys
+import time
+
+import wimpy.config as config
+
+from wimpy.BSPTilingStrategy import BSPTilingStrategy
+
+DISPLAY_SIZE = (0, 0, 2560, 1400)
+SPLIT_RATIOS = (1.0, 1.66667, 2.5)
+REPEAT = 5
+
+
+class SyntheticDisplay(object):
+
+    def __init__(self, hwnd, display_size):
+        self.hwnd = hwnd
+        self.display_size = display_size
+
+    def __str__(self):
+        return f"[{self.hwnd}] {self.display_size}"
+
+
+class SyntheticWindow(object):
+
+    def __init__(self, hwnd, display_size):
+        self.hwnd = hwnd
+        self.display_size = display_size
+        self.topmost = False
+        self.min_size = None
+        self.max_size = None
+
+    def move_to(self, size):
+        self.display_size = size
+
+
+def _skewed_rects(rng, count):
+    """windows cascading down from the top left corner, as freshly opened windows do"""
+    l, t, r, b = DISPLAY_SIZE
+    width, height = (r - l) // 2, (b - t) // 2
+    rects = []
+    for i in range(count):
+        x = l + (i * 24) % (r - l - width)
+        y = t + (i * 24) % (b - t - height)
+        rects.append((x, y, x + width, y + height))
+    return rects
+
+
+def _random_rects(rng, count):
+    l, t, r, b = DISPLAY_SIZE
+    rects = []
+    for _ in range(count):
+        width = rng.randint(300, (r - l) // 2)
+        height = rng.randint(200, (b - t) // 2)
+        x = rng.randint(l, r - width)
+        y = rng.randint(t, b - height)
+        rects.append((x, y, x + width, y + height))
+    return rects
+
+
+STARTS = (("skewed", _skewed_rects), ("random", _random_rects))
+
+
+def _displacement(before, after):
+    return sum(abs(a - b) for a, b in zip(before, after))
+
+
+class Layout(object):
+    """one display laid out by one strategy, steps plan and apply a change"""
+
+    def __init__(self, windows):
+        self.display = SyntheticDisplay(1, DISPLAY_SIZE)
+        self.strategy = BSPTilingStrategy()
+        self.windows = windows
+
+    def step(self):
+        """plans the display, applies the moves, returns (seconds, moves, displacement)"""
+        start = time.perf_counter()
+        placements = self.strategy.plan(self.display, self.windows, None)
+        elapsed = time.perf_counter() - start
+
+        moves = 0
+        displacement = 0
+        for window, window_size in placements:
+            if window.display_size != window_size:
+                moves += 1
+                displacement += _displacement(window.display_size, window_size)
+                window.move_to(window_size)
+        return elapsed, moves, displacement
+
+
+def _measure(setup, change):
+    """runs change on REPEAT fresh layouts, returns (fastest seconds, moves, displacement) of the step after it
+
+    Moves and displacement are the same in every run, the layouts are built from the same rects."""
+    best = None
+    for _ in range(REPEAT):
+        layout = setup()
+        change(layout)
+        elapsed, moves, displacement = layout.step()
+        if best is None or elapsed < best[0]:
+            best = (elapsed, moves, displacement)
+    return best
+
+
+def run(window_count, ratio, seed=0):
+    config.override(partition_split_ratio=ratio)
+
+    for start_name, start_rects in STARTS:
+        rects = start_rects(random.Random(seed), window_count + 1)
+        extra_rect = rects.pop()
+
+        def fresh():
+            return Layout([SyntheticWindow(i + 2, rect) for i, rect in enumerate(rects)])
+
+        def settled():
+            layout = fresh()
+            layout.step()
+            return layout
+
+        def insert(layout):
+            layout.windows.append(SyntheticWindow(len(rects) + 2, extra_rect))
+
+        def remove(layout):
+            layout.windows.pop(len(layout.windows) // 2)
+
+        def rebalance(layout):
+            layout.strategy.rebalance()
+
+        scenarios = [
+            ("initial layout", fresh, lambda layout: None),
+            ("open window", settled, insert),
+            ("close window", settled, remove),
+            ("rebalance", settled, rebalance),
+        ]
+        for label, setup, change in scenarios:
+            if label == "close window" and window_count == 1:
+                continue
+            elapsed, moves, displacement = _measure(setup, change)
+            print(f"  {start_name:<8}{label:<18}{elapsed * 1e6:>10.1f} us"
+                  f"{moves:>6} moves{displacement:>10} px")
+
+
+if __name__ == "__main__":
+    config.load_file("config.ini")
+    counts = [int(c) for c in sys.argv[1:]] or [1, 4, 16, 64, 256]
+    for ratio in SPLIT_RATIOS:
+        for count in counts:
+            print(f"{count} windows, split ratio {ratio}")
+            run(count, ratio)
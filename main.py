@@ -1,43 +1,94 @@
+import time
+
+# startup phases are timed from here
+START = time.perf_counter()
+
 import argparse
+import contextlib
 import logging
 import os
 import sys
-import wx
 
 import wimpy.config as config
+import wimpy.logs as logs
+import wimpy.metrics as metrics
+import wimpy.profiling as profiling
+import wimpy.session as session
 
-from wimpy.WimpyTaskBarIcon import WimpyTaskBarIcon
 from wimpy.WindowManagementStrategy import WindowManagementStrategy
 from wimpy.BSPTilingStrategy import BSPTilingStrategy
 from wimpy.WindowTracker import WindowTracker
 from wimpy.DebugWindowTracker import DebugWindowTracker
 from wimpy.WinEventHandler import WinEventHandler
 from wimpy.WindowManager import WindowManager
+from wimpy.LayoutWorker import PRIORITY_EVENT
 
 PROGRAM_NAME = "wimpy"
 TRAY_ICON_PATH = os.path.join(os.getcwd(), "icon", "icon.ico")
 CONFIG_FILENAME = "config.ini"
 LOG_FILENAME = "log.txt"
+SESSION_FILENAME = "session.json"
+
+
+@contextlib.contextmanager
+def startup_phase(name):
+    start = time.perf_counter()
+    yield
+    logging.info("Startup phase '%s' took %.1f ms.",
+                 name, (time.perf_counter() - start) * 1000)
 
 
 def configure():
-    logging.basicConfig(level=logging.DEBUG,
-                        format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
-                        datefmt='%Y-%m-%d:%H:%M:%S',
-                        handlers=[
-                            logging.StreamHandler(sys.stdout),
-                            logging.FileHandler(LOG_FILENAME, encoding="utf-8")
-                        ])
     config.load_file(CONFIG_FILENAME)
+    logs.configure(LOG_FILENAME,
+                   config.log_level(),
+                   config.log_max_bytes(),
+                   config.log_backup_count(),
+                   config.log_ring_buffer_size())
+    config.subscribe(apply_config)
+
+
+def apply_config(previous, current):
+    """applies the logging and metrics settings of a reloaded config"""
+    if previous.log_level != current.log_level:
+        logs.set_level(current.log_level)
+
+    if previous.metrics_enabled != current.metrics_enabled:
+        if current.metrics_enabled:
+            metrics.enable()
+        else:
+            metrics.disable()
+    if (previous.metrics_enabled, previous.metrics_export_path, previous.metrics_export_interval) != \
+            (current.metrics_enabled, current.metrics_export_path, current.metrics_export_interval):
+        metrics.stop_export()
+        if current.metrics_enabled and current.metrics_export_path:
+            metrics.start_export(current.metrics_export_path,
+                                 current.metrics_export_interval)
 
 
 def main():
     argparser = argparse.ArgumentParser()
     argparser.add_argument("-d", "--debug", action="store_true",
                            help="Disables window management for debugging purposes.")
+    argparser.add_argument("--record-trace", metavar="PATH",
+                           help="Records all window events to a trace file for benchmarks/replay_trace.py.")
+    argparser.add_argument("--no-session", action="store_true",
+                           help="Ignores the session saved on the last exit and lays out all windows from scratch.")
+    argparser.add_argument("--profile", metavar="SECONDS", type=float,
+                           help=f"Profiles the event hook and layout threads for SECONDS after startup, writing to '{profiling.DIRECTORY}'.")
+    argparser.add_argument("--profile-mode", choices=profiling.MODES, default=profiling.SAMPLE,
+                           help="Samples the stacks of all threads (default) or traces every call with cProfile.")
     args = argparser.parse_args()
 
+    imported = time.perf_counter()
     configure()
+    logging.info("Startup phase 'imports' took %.1f ms.",
+                 (imported - START) * 1000)
+    if config.metrics_enabled():
+        metrics.enable()
+        if config.metrics_export_path():
+            metrics.start_export(config.metrics_export_path(),
+                                 config.metrics_export_interval())
 
     if args.debug:
         tracker = DebugWindowTracker()
@@ -46,14 +97,39 @@ def main():
         tracker = WindowTracker()
         strategy = BSPTilingStrategy()
 
-    window_manager = WindowManager(tracker, strategy)
+    with startup_phase("window manager"):
+        saved_session = None if args.no_session or args.debug else session.load(
+            SESSION_FILENAME)
+        window_manager = WindowManager(tracker, strategy, saved_session)
     event_handler = WinEventHandler()
+    if args.record_trace:
+        event_handler.start_recording(args.record_trace)
+
+    with startup_phase("tray icon"):
+        # wx is only imported once windows are laid out
+        import wx
+        from wimpy.WimpyTaskBarIcon import WimpyTaskBarIcon
 
-    app = wx.App()
-    taskbar = WimpyTaskBarIcon(PROGRAM_NAME, TRAY_ICON_PATH, window_manager)
-    event_handler.start_hook(window_manager.on_event, window_manager.on_error)
+        app = wx.App()
+        taskbar = WimpyTaskBarIcon(
+            PROGRAM_NAME, TRAY_ICON_PATH, window_manager)
+    with startup_phase("event hook"):
+        event_handler.start_hook(window_manager.on_event,
+                                 window_manager.on_error, window_manager.MESSAGE_MAP.keys())
+    profiling.register_thread("event hook", event_handler.run_on_thread)
+    profiling.register_thread("layout worker", lambda func: window_manager.worker.submit(
+        PRIORITY_EVENT, func))
+    if args.profile:
+        profiling.start(args.profile, args.profile_mode)
+    logging.info("Started in %.1f ms.", (time.perf_counter() - START) * 1000)
     app.MainLoop()
     event_handler.stop_hook()
+    event_handler.stop_recording()
+    if not args.debug:
+        session.save(SESSION_FILENAME, window_manager.session_state())
+    window_manager.stop()
+    metrics.stop_export()
+    logs.stop()
     sys.exit(0)
 
 
@@ -0,0 +1,79 @@
+"""Dragging a tiled window onto another tile, on a SimulatedDesktop.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+import wimpy.config as config
+import wimpy.win32 as win32
+
+from wimpy.BSPTilingStrategy import BSPTilingStrategy
+from wimpy.SimulatedDesktop import SimulatedDesktop
+from wimpy.WindowManager import WindowManager
+from wimpy.WindowTracker import WindowTracker
+
+MONITOR = (0, 0, 1920, 1080)
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "config.ini")
+
+
+class DragTest(unittest.TestCase):
+
+    def setUp(self):
+        config.load_file(CONFIG_PATH)
+        self.desktop = SimulatedDesktop((MONITOR,))
+        win32.set_backend(self.desktop)
+        self.left = self.desktop.create_window((0, 0, 900, 900), "left")
+        self.right = self.desktop.create_window((1000, 0, 1900, 900), "right")
+        self.desktop.pending_events.clear()
+
+        self.manager = WindowManager(WindowTracker(), BSPTilingStrategy())
+        # events and relayouts are run explicitly instead of by the worker thread
+        self.manager.stop()
+        self.hook = self.desktop.SetWinEventHook(win32.EVENT_MIN, win32.EVENT_MAX,
+                                                 self.manager.on_event, None)
+        self._settle()
+
+    def tearDown(self):
+        self.desktop.UnhookWinEvent(self.hook)
+
+    def _settle(self):
+        """delivers events and runs relayouts until the desktop is quiet"""
+        while True:
+            delivered = self.desktop.pump()
+            self.manager.worker.run_pending()
+            self.manager.scheduler.flush()
+            self.manager.flush_echoes()
+            if delivered == 0 and len(self.desktop.pending_events) == 0:
+                break
+
+    def _rect(self, hwnd):
+        return tuple(self.desktop.GetWindowRect(hwnd))
+
+    def test_drop_on_other_tile_swaps(self):
+        left_rect, right_rect = self._rect(self.left), self._rect(self.right)
+        self.assertLess(left_rect[0], right_rect[0])
+
+        # drop the left window mostly over the right tile
+        l, t, r, b = right_rect
+        self.desktop.move_window(self.left, (l - 100, t + 50, r - 100, b + 50))
+        self._settle()
+
+        self.assertEqual(self._rect(self.left), right_rect)
+        self.assertEqual(self._rect(self.right), left_rect)
+
+    def test_drop_on_own_tile_snaps_back(self):
+        left_rect, right_rect = self._rect(self.left), self._rect(self.right)
+
+        l, t, r, b = left_rect
+        self.desktop.move_window(self.left, (l + 100, t + 50, r + 100, b + 50))
+        self._settle()
+
+        self.assertEqual(self._rect(self.left), left_rect)
+        self.assertEqual(self._rect(self.right), right_rect)
+
+
+if __name__ == "__main__":
+    unittest.main()
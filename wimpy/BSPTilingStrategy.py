@@ -1,92 +1,199 @@
+import functools
 import logging
 
+import wimpy.assignment as assignment
 import wimpy.config as config
 
-from wimpy.Display import Display
+from wimpy.BSPTree import BSPNode, BSPTree
 from wimpy.WindowManagementStrategy import *
 
 
+# largest group of windows matched to leaves in one assignment, larger groups are split
+# between the halves of the partition first
+EXACT_ASSIGNMENT_SIZE = 16
+
+
+@functools.lru_cache(maxsize=64)
+def padded_display_size(display_size, padding):
+    """returns the part of a display's work area windows are laid out in"""
+    return inset_size(display_size, padding)
+
+
+@functools.lru_cache(maxsize=4096)
+def split_size(size, ratio):
+    """returns the (left, right) halves of size, split vertically if it is wider than ratio"""
+    l, t, r, b = size
+    hw = (r - l) // 2
+    hh = (b - t) // 2
+
+    if hw > hh * ratio:
+        return ((l, t, l + hw, b), (l + hw, t, r, b))
+    else:
+        return ((l, t, r, t + hh), (l, t + hh, r, b))
+
+
+@functools.lru_cache(maxsize=256)
+def balanced_leaf_sizes(size, count, ratio):
+    """returns the leaf sizes of a balanced partition of size into count leaves, in tree order
+
+    Entries depend only on their arguments, so displays of the same size share them
+    and changed settings simply miss."""
+    if count == 1:
+        return (size,)
+    left_count = (count + 1) // 2
+    left_size, right_size = split_size(size, ratio)
+    return balanced_leaf_sizes(left_size, left_count, ratio) + \
+        balanced_leaf_sizes(right_size, count - left_count, ratio)
+
+
+@functools.lru_cache(maxsize=256)
+def balanced_leaf_rects(size, count, ratio, margin):
+    """returns the window rects of balanced_leaf_sizes() inset by margin"""
+    return tuple(inset_size(leaf_size, margin) for leaf_size in balanced_leaf_sizes(size, count, ratio))
+
+
+def clear_geometry_cache():
+    padded_display_size.cache_clear()
+    split_size.cache_clear()
+    balanced_leaf_sizes.cache_clear()
+    balanced_leaf_rects.cache_clear()
+
+
 class BSPTilingStrategy(WindowManagementStrategy):
     """description of class"""
 
     def __init__(self):
-        pass
+        self.trees = {}  # display hwnd -> BSPTree
 
-    def apply(self, display, windows, active_hwnd):
+    def plan(self, display, windows, active_hwnd):
         # filter out topmost windows
         notopmost_windows = list(filter(lambda w: not w.topmost, windows))
-        self._partition_display(display, notopmost_windows, active_hwnd)
+        return self._partition_display(display, notopmost_windows, active_hwnd)
+
+    def rebalance(self, display=None):
+        """discards the layout tree of display (or all displays), it is rebuilt on the next apply"""
+        if display is None:
+            self.trees.clear()
+        else:
+            self.trees.pop(int(display.hwnd), None)
+
+    def config_changed(self, previous, current):
+        if previous.display_padding != current.display_padding:
+            padded_display_size.cache_clear()
+        if previous.partition_split_ratio != current.partition_split_ratio:
+            clear_geometry_cache()
+            for tree in self.trees.values():
+                tree.relayout()
+
+    def constraints_changed(self, display, window):
+        tree = self.trees.get(int(display.hwnd))
+        if tree is not None:
+            tree.constraints_changed(window)
+
+    def window_dropped(self, display, window):
+        tree = self.trees.get(int(display.hwnd))
+        if tree is not None and tree.drop(window):
+            logging.debug("[%s] Dropped on another tile, swapping.", window.hwnd)
+
+    def save_state(self):
+        """returns {display hwnd: tree}, a tree is a window hwnd or a [left, right] split"""
+        return {str(display_hwnd): self._node_to_state(tree.root)
+                for display_hwnd, tree in self.trees.items() if tree.root is not None}
+
+    def restore_state(self, state, displays, windows):
+        for display_hwnd, nodes in state.items():
+            display = displays.get(int(display_hwnd))
+            root = self._node_from_state(nodes, windows)
+            if display is None or root is None:
+                continue
+            display_size = padded_display_size(
+                display.display_size, config.display_padding())
+            self.trees[int(display_hwnd)] = BSPTree(
+                display_size, self._split_display_size, root)
+        logging.debug("Restored the layout of %d display(s).", len(self.trees))
+
+    def _node_to_state(self, node):
+        if node.is_leaf():
+            return int(node.window.hwnd)
+        return [self._node_to_state(node.left), self._node_to_state(node.right)]
+
+    def _node_from_state(self, nodes, windows):
+        """returns the BSPNode of a saved tree without the windows that are gone, or None"""
+        if not isinstance(nodes, list):
+            window = windows.get(nodes)
+            return BSPNode(window) if window is not None else None
+        left = self._node_from_state(nodes[0], windows)
+        right = self._node_from_state(nodes[1], windows)
+        if left is None or right is None:
+            # the remaining side takes over the partition, as BSPTree.remove does
+            return left or right
+        return BSPNode(left=left, right=right)
 
     def _partition_display(self, display, windows, active_hwnd):
-        display_size = inset_size(
+        display_size = padded_display_size(
             display.display_size, config.display_padding())
-        logging.debug(f"partitioning display: {display}")
-        self._recursive_partition(display_size, windows, active_hwnd)
+        logging.debug("partitioning display: [%s] %s",
+                      int(display.hwnd), display.display_size)
+
+        tree = self.trees.get(int(display.hwnd))
+        if tree is None:
+            root = self._optimal_partition(display_size, list(windows))
+            tree = BSPTree(display_size, self._split_display_size, root)
+            self.trees[int(display.hwnd)] = tree
+        else:
+            tree.update(display_size, windows)
 
-    def _recursive_partition(self, display_size, windows, active_hwnd):
+        return tree.placements(config.window_margin())
+
+    def _optimal_partition(self, display_size, windows):
+        """returns the root BSPNode of a full partition of windows (None if there are none)
+
+        The leaf rects of the balanced partition come from the geometry cache, windows
+        are assigned to them keeping as much of their current area as possible."""
         if len(windows) == 0:
-            return
-        elif len(windows) == 1:
-            self._move_window(windows[0], display_size)
-        else:
-            # partition the display_size
-            left_size, right_size = self._split_display_size(display_size)
-            left = []
-            right = []
-
-            # sort window order for placement (by largest preference)
-            windows.sort(key=lambda w: abs(self._get_partition_preference(
-                w.display_size, left_size, right_size)), reverse=True)
-
-            # assign windows to their preferred partition (if would not unbalance)
-            max_windows = len(windows) // 2 + 1 if (len(windows) %
-                                                    2 == 1) else len(windows) // 2
-            for window in windows:
-                pref = self._get_partition_preference(
-                    window.display_size, left_size, right_size)
-                pref_text = "LEFT" if pref <= 0 else "RIGHT"
-                if pref == 0:
-                    pref_text = "NONE"
-                if pref <= 0:  # tiebreak prefers left
-                    if len(left) < max_windows:
-                        left.append(window)
-                    else:
-                        right.append(window)
-                else:
-                    if len(right) < max_windows:
-                        right.append(window)
-                    else:
-                        left.append(window)
-
-            self._recursive_partition(left_size, left, active_hwnd)
-            self._recursive_partition(right_size, right, active_hwnd)
-
-    def _get_partition_preference(self, size, a, b):
-        """returns an int representing preference for b (positive) or a (negative)"""
-        overlap_a = 0
-        overlap_b = 0
-        if check_overlap(size, a):
-            overlap_a = overlap_area(size, a)
-        if check_overlap(size, b):
-            overlap_b = overlap_area(size, b)
-
-        return overlap_b - overlap_a
-
-    def _move_window(self, window, size):
-        window_size = inset_size(size, config.window_margin())
-        logging.debug(f"[{window.hwnd}] move_to: {window_size}")
-        window.move_to(window_size)
-
-    def _display_area(self, size):
-        l, t, r, b = size
-        return (r - l) * (b - t)
+            return None
+
+        root = self._partition_skeleton(len(windows))
+        ordered = self._assign_leaves(display_size, windows,
+                                      config.partition_split_ratio(), config.window_margin())
+        for leaf, window in zip(root.leaves(), ordered):
+            leaf.window = window
+        return root
+
+    def _assign_leaves(self, size, windows, ratio, margin):
+        """returns windows in the leaf order of the balanced partition of size
+
+        Up to EXACT_ASSIGNMENT_SIZE windows are matched to the leaves exactly. More are
+        first split between the two halves of size by the area they keep in each, so
+        building a layout stays O(n log n) beyond that."""
+        window_sizes = [w.display_size for w in windows]
+        if len(windows) <= EXACT_ASSIGNMENT_SIZE:
+            leaf_sizes = balanced_leaf_rects(size, len(windows), ratio, margin)
+            weights = assignment.overlap_matrix(window_sizes, leaf_sizes)
+            # windows overlapping no leaf (or equally) go to the closest one; the distance terms
+            # of all windows together stay below 1 px², so they never outweigh an overlap difference
+            distances = assignment.center_distance_matrix(window_sizes, leaf_sizes)
+            weights -= distances / (len(windows) * (distances.max() + 1))
+
+            ordered = [None] * len(windows)
+            for window, leaf_index in zip(windows, assignment.max_weight_assignment(weights)):
+                ordered[leaf_index] = window
+            return ordered
+
+        halves = split_size(size, ratio)
+        left, right = assignment.split_assignment(
+            assignment.overlap_matrix(window_sizes, halves), (len(windows) + 1) // 2,
+            assignment.center_distance_matrix(window_sizes, halves))
+        return self._assign_leaves(halves[0], [windows[i] for i in left], ratio, margin) + \
+            self._assign_leaves(halves[1], [windows[i] for i in right], ratio, margin)
+
+    def _partition_skeleton(self, count):
+        """returns a balanced tree of count empty leaves, the left side holds the extra one"""
+        if count == 1:
+            return BSPNode()
+        left_count = (count + 1) // 2
+        return BSPNode(left=self._partition_skeleton(left_count),
+                       right=self._partition_skeleton(count - left_count))
 
     def _split_display_size(self, size):
-        l, t, r, b = size
-        hw = (r - l) // 2
-        hh = (b - t) // 2
-
-        if hw > hh * config.partition_split_ratio():
-            return [(l, t, l + hw, b), (l + hw, t, r, b)]
-        else:
-            return [(l, t, r, t + hh), (l, t + hh, r, b)]
+        return split_size(size, config.partition_split_ratio())
@@ -0,0 +1,297 @@
+from wimpy.WindowManagementStrategy import *
+
+
+class BSPNode(object):
+    """A partition of a display, either a leaf holding one window or split in two"""
+
+    def __init__(self, window=None, left=None, right=None):
+        self.parent = None
+        self.size = None
+        self.window = window
+        # the window's minimum size as the layout knows it, updated by BSPTree.constraints_changed()
+        self.window_min_size = getattr(window, "min_size", None)
+        self.left = None
+        self.right = None
+        self._min_size = None  # (size, min_size) of the last min_size() call on a split
+        if left is not None:
+            self._set_children(left, right)
+
+    def is_leaf(self):
+        return self.left is None
+
+    def leaves(self):
+        if self.is_leaf():
+            return [self]
+        return self.left.leaves() + self.right.leaves()
+
+    def min_size(self, size, split):
+        """returns the (width, height) this subtree needs for the learned minimum sizes of its windows
+
+        The direction of every split is taken from laying the subtree out in size. The
+        result is cached per node until invalidate_min_size() is called on a descendant."""
+        if self.is_leaf():
+            return self.window_min_size or (0, 0)
+        if self._min_size is not None and self._min_size[0] == size:
+            return self._min_size[1]
+        left_size, right_size = split(size)
+        left_width, left_height = self.left.min_size(left_size, split)
+        right_width, right_height = self.right.min_size(right_size, split)
+        if left_size[2] < size[2]:
+            min_size = (left_width + right_width, max(left_height, right_height))
+        else:
+            min_size = (max(left_width, right_width), left_height + right_height)
+        self._min_size = (size, min_size)
+        return min_size
+
+    def invalidate_min_size(self):
+        """forgets the cached minimum sizes of this node and its ancestors"""
+        node = self
+        while node is not None:
+            node._min_size = None
+            node = node.parent
+
+    def layout(self, size, split, constrained=False):
+        """assigns size to this node and recomputes the sizes of its subtree
+
+        Splits only move for minimum sizes if constrained, i.e. some window has one."""
+        self.size = size
+        if not self.is_leaf():
+            if constrained:
+                left_size, right_size = self._fit_split(size, split)
+            else:
+                left_size, right_size = split(size)
+            self.left.layout(left_size, split, constrained)
+            self.right.layout(right_size, split, constrained)
+
+    def _fit_split(self, size, split):
+        """splits size, moving the split so both sides get their minimum size as far as size allows"""
+        left_size, right_size = split(size)
+        l, t, r, b = size
+        left_min = self.left.min_size(left_size, split)
+        right_min = self.right.min_size(right_size, split)
+        # side by side if the left part ends before the right edge
+        if left_size[2] < r:
+            x = max(min(max(left_size[2], l + left_min[0]), r - right_min[0]), l)
+            if x == left_size[2]:
+                return left_size, right_size
+            return (l, t, x, b), (x, t, r, b)
+        y = max(min(max(left_size[3], t + left_min[1]), b - right_min[1]), t)
+        if y == left_size[3]:
+            return left_size, right_size
+        return (l, t, r, y), (l, y, r, b)
+
+    def _set_children(self, left, right):
+        self.left = left
+        self.right = right
+        left.parent = self
+        right.parent = self
+        self.invalidate_min_size()
+
+
+class BSPTree(object):
+    """Persistent BSP partition of a single display
+
+    Inserting a window splits one leaf and removing a window collapses its parent,
+    so only the affected subtree is laid out again. With learned minimum sizes the
+    layout starts at the highest ancestor whose split has to move instead."""
+
+    def __init__(self, display_size, split, root=None):
+        """split(size) returns the (left, right) sizes of a partition"""
+        self.display_size = display_size
+        self.split = split
+        self.root = None
+        self.nodes = {}  # hwnd -> leaf BSPNode
+        self.constrained = set()  # hwnds of the windows with a minimum size
+        if root is not None:
+            self._set_root(root)
+            for leaf in root.leaves():
+                self.nodes[leaf.window.hwnd] = leaf
+                self._update_constrained(leaf)
+            root.layout(display_size, split, self._is_constrained())
+
+    def __contains__(self, hwnd):
+        return hwnd in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def update(self, display_size, windows):
+        """brings the tree in sync with display_size and windows"""
+        if display_size != self.display_size:
+            self.display_size = display_size
+            if self.root is not None:
+                self.root.layout(display_size, self.split,
+                                 self._is_constrained())
+
+        hwnds = {w.hwnd for w in windows}
+        for hwnd in [h for h in self.nodes if h not in hwnds]:
+            self.remove(hwnd)
+        for window in windows:
+            node = self.nodes.get(window.hwnd)
+            if node is None:
+                self.insert(window)
+            else:
+                node.window = window
+                # constraints may have been learned while the window was elsewhere
+                if getattr(window, "min_size", None) != node.window_min_size:
+                    self.constraints_changed(window)
+
+    def relayout(self):
+        """recomputes every partition, after the split rule changed"""
+        if self.root is not None:
+            self.root.layout(self.display_size, self.split,
+                             self._is_constrained())
+
+    def constraints_changed(self, window):
+        """lays out what the changed minimum size of window moves"""
+        leaf = self.nodes.get(window.hwnd)
+        if leaf is None:
+            return
+        was_constrained = self._is_constrained()
+        leaf.window_min_size = getattr(window, "min_size", None)
+        self._update_constrained(leaf)
+        leaf.invalidate_min_size()
+        if was_constrained or self._is_constrained():
+            self._layout_subtree(leaf, fit=True)
+
+    def insert(self, window):
+        """splits the leaf the window overlaps most, returns the window's leaf"""
+        leaf = BSPNode(window)
+        self.nodes[window.hwnd] = leaf
+        self._update_constrained(leaf)
+
+        if self.root is None:
+            self._set_root(leaf)
+            leaf.layout(self.display_size, self.split)
+            return leaf
+
+        target = max(self.root.leaves(),
+                     key=lambda n: self._insert_preference(window, n))
+        left_size, right_size = self.split(target.size)
+        prefers_left = self._overlap(window.display_size, left_size) > \
+            self._overlap(window.display_size, right_size)
+
+        sibling = BSPNode(target.window)
+        sibling.window_min_size = target.window_min_size
+        self.nodes[target.window.hwnd] = sibling
+        target.window = None
+        if prefers_left:
+            target._set_children(leaf, sibling)
+        else:
+            target._set_children(sibling, leaf)
+        self._layout_subtree(target)
+        return leaf
+
+    def remove(self, hwnd):
+        """removes the window's leaf, its sibling takes over the parent partition"""
+        leaf = self.nodes.pop(hwnd, None)
+        if leaf is None:
+            return None
+        was_constrained = hwnd in self.constrained
+        self.constrained.discard(hwnd)
+
+        parent = leaf.parent
+        if parent is None:
+            self.root = None
+            return None
+
+        sibling = parent.left if parent.right is leaf else parent.right
+        grandparent = parent.parent
+        if grandparent is None:
+            self._set_root(sibling)
+        elif grandparent.left is parent:
+            grandparent._set_children(sibling, grandparent.right)
+        else:
+            grandparent._set_children(grandparent.left, sibling)
+        sibling.size = parent.size
+        # the removed window may have been the last with a minimum size
+        self._layout_subtree(sibling, fit=was_constrained or None)
+        return sibling
+
+    def drop(self, window):
+        """swaps window with the window of the leaf its rect overlaps most, after the user moved it
+
+        A window still overlapping its own leaf most keeps it. Returns True if the leaves were swapped."""
+        leaf = self.nodes.get(window.hwnd)
+        if leaf is None:
+            return False
+        target = max(self.root.leaves(),
+                     key=lambda n: self._overlap(window.display_size, n.size))
+        if self._overlap(window.display_size, target.size) <= \
+                self._overlap(window.display_size, leaf.size):
+            return False
+
+        leaf.window, target.window = target.window, leaf.window
+        leaf.window_min_size, target.window_min_size = target.window_min_size, leaf.window_min_size
+        self.nodes[leaf.window.hwnd] = leaf
+        self.nodes[target.window.hwnd] = target
+        if self._is_constrained():
+            leaf.invalidate_min_size()
+            target.invalidate_min_size()
+            self._layout_subtree(leaf)
+            self._layout_subtree(target)
+        return True
+
+    def placements(self, margin):
+        """returns [(window, window_size)] for all leaves"""
+        if self.root is None:
+            return []
+        return [(leaf.window, self._constrain(leaf.window, inset_size(leaf.size, margin)))
+                for leaf in self.root.leaves()]
+
+    def _layout_subtree(self, node, fit=None):
+        """lays out node after it changed, from the highest ancestor whose split it moves
+
+        Minimum sizes are only considered if a window has one (or fit is True, when
+        the last one was just removed). The cached minimum sizes above node must
+        have been invalidated."""
+        if fit is None:
+            fit = self._is_constrained()
+        if not fit:
+            node.layout(node.size, self.split)
+            return
+
+        top = node
+        ancestor = node.parent
+        while ancestor is not None:
+            if ancestor._fit_split(ancestor.size, self.split) != (ancestor.left.size, ancestor.right.size):
+                top = ancestor
+            ancestor = ancestor.parent
+        top.layout(top.size, self.split, self._is_constrained())
+
+    def _is_constrained(self):
+        return len(self.constrained) > 0
+
+    def _update_constrained(self, leaf):
+        if leaf.window_min_size:
+            self.constrained.add(leaf.window.hwnd)
+        else:
+            self.constrained.discard(leaf.window.hwnd)
+
+    def _constrain(self, window, size):
+        """grows or shrinks size to the learned limits of window, keeping its top left corner
+
+        Requesting a rect the window would refuse only starts another round of moves."""
+        min_size = getattr(window, "min_size", None)
+        max_size = getattr(window, "max_size", None)
+        if min_size is None and max_size is None:
+            return size
+        l, t, r, b = size
+        width, height = r - l, b - t
+        if min_size is not None:
+            width, height = max(width, min_size[0]), max(height, min_size[1])
+        if max_size is not None:
+            width, height = min(width, max_size[0]), min(height, max_size[1])
+        return (l, t, l + width, t + height)
+
+    def _set_root(self, node):
+        self.root = node
+        node.parent = None
+
+    def _insert_preference(self, window, node):
+        return (self._overlap(window.display_size, node.size), area_from_size(node.size))
+
+    def _overlap(self, size_a, size_b):
+        if check_overlap(size_a, size_b):
+            return overlap_area(size_a, size_b)
+        return 0
@@ -0,0 +1,107 @@
+class Backend(object):
+    """Native window system interface used through wimpy.win32
+
+    Rects are (left, top, right, bottom) tuples, handles are ints."""
+
+    # monitors
+
+    def EnumDisplayMonitors(self):
+        raise NotImplementedError()
+
+    def GetMonitorInfo(self, hmonitor):
+        """returns {"Monitor": rect, "Work": rect}"""
+        raise NotImplementedError()
+
+    def MonitorFromPoint(self, point):
+        """returns the monitor containing point, or the primary monitor"""
+        raise NotImplementedError()
+
+    def MonitorFromWindow(self, hwnd):
+        """returns the monitor nearest to the window"""
+        raise NotImplementedError()
+
+    # windows
+
+    def EnumWindows(self):
+        raise NotImplementedError()
+
+    def GetForegroundWindow(self):
+        raise NotImplementedError()
+
+    def GetWindowClassName(self, hwnd):
+        raise NotImplementedError()
+
+    def GetWindowRect(self, hwnd):
+        raise NotImplementedError()
+
+    def GetWindowStyles(self, hwnd):
+        raise NotImplementedError()
+
+    def GetWindowExStyles(self, hwnd):
+        raise NotImplementedError()
+
+    def GetWindowText(self, hwnd):
+        raise NotImplementedError()
+
+    def GetWindowProcessId(self, hwnd):
+        raise NotImplementedError()
+
+    def IsIconic(self, hwnd):
+        raise NotImplementedError()
+
+    def IsHungAppWindow(self, hwnd):
+        """returns True if the window's thread has not processed messages for a while, does not block"""
+        raise NotImplementedError()
+
+    def IsWindow(self, hwnd):
+        raise NotImplementedError()
+
+    def IsWindowVisible(self, hwnd):
+        raise NotImplementedError()
+
+    def IsZoomed(self, hwnd):
+        raise NotImplementedError()
+
+    def MoveWindow(self, hwnd, x, y, cx, cy, repaint):
+        raise NotImplementedError()
+
+    def SetWindowPos(self, hwnd, hwnd_insert_after, x, y, cx, cy, u_flags):
+        raise NotImplementedError()
+
+    def SendMessageTimeout(self, hwnd, message, timeout):
+        """returns True if the window processed message within timeout ms, gives up at once on hung windows"""
+        raise NotImplementedError()
+
+    def DeferWindowPositions(self, positions):
+        """moves all [(hwnd, rect)] in one transaction, returns False if it had to fall back to single moves"""
+        raise NotImplementedError()
+
+    # processes
+
+    def GetProcessImageName(self, pid):
+        """returns the path of the process' executable, or None if it cannot be queried"""
+        raise NotImplementedError()
+
+    # events
+
+    def GetTickCount(self):
+        """returns milliseconds since system start, the clock of dwmsEventTime"""
+        raise NotImplementedError()
+
+    def SetWinEventHook(self, event_min, event_max, callback, err_callback):
+        """hooks out-of-context events on the calling thread, returns the hook handle
+
+        callback(hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime)"""
+        raise NotImplementedError()
+
+    def UnhookWinEvent(self, hook):
+        raise NotImplementedError()
+
+    def RunMessageLoop(self, on_start, on_thread_message, on_stop):
+        """runs a message loop on the calling thread until WM_QUIT is posted to it
+
+        on_thread_message(message) is called for other messages posted to the thread"""
+        raise NotImplementedError()
+
+    def PostThreadMessage(self, thread_id, message):
+        raise NotImplementedError()
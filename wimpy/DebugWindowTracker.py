@@ -1,5 +1,6 @@
 import logging
 
+import wimpy.logs as logs
 import wimpy.win32 as win32
 
 from wimpy.WindowTracker import WindowTracker
@@ -10,8 +11,11 @@ class DebugWindowTracker(WindowTracker):
     def should_track_handle(self, hwnd):
         should_track = super().should_track_handle(hwnd)
 
-        logging.debug(
-            f"[{hwnd}] {win32.GetWindowText(hwnd)} ({win32.GetWindowClassName(hwnd)}) :: {'TRACKED' if should_track else 'IGNORED'}")
+        if not logs.enabled_for(logging.DEBUG):
+            return should_track
+
+        logging.debug("[%s] %s (%s) :: %s", hwnd, win32.GetWindowText(hwnd),
+                      win32.GetWindowClassName(hwnd), "TRACKED" if should_track else "IGNORED")
         if should_track:
             self._print_window_styles(hwnd)
 
@@ -20,4 +24,4 @@ class DebugWindowTracker(WindowTracker):
     def _print_window_styles(self, hwnd):
         style_map = win32.GetWindowStyleMap(hwnd)
         for key, val in style_map.items():
-            logging.debug(f"{key}: {val}")
+            logging.debug("%s: %s", key, val)
@@ -1,6 +1,6 @@
 import logging
-import win32api
-import win32con
+
+import wimpy.win32 as win32
 
 from wimpy.Window import Window
 
@@ -11,7 +11,6 @@ class Display(object):
     def __init__(self, hwnd):
         self.hwnd = hwnd
         self._cache_properties()
-        self.windows = []
 
     def __eq__(self, value):
         return int(self.hwnd) == int(value.hwnd)
@@ -23,19 +22,27 @@ class Display(object):
         l, t, r, b = self.display_size
         return f"[{int(self.hwnd)}] {r - l}x{b - t} @ ({l}, {t}){' PRIMARY' if self.is_primary else ''}"
 
+    def refresh(self):
+        """re-reads the monitor rects, returns True if they changed"""
+        previous = (self.display_size, self.monitor_size, self.is_primary)
+        self._cache_properties()
+        return previous != (self.display_size, self.monitor_size, self.is_primary)
+
     def _cache_properties(self):
-        self.display_size = self._get_display_size()
+        monitor_info = win32.GetMonitorInfo(self.hwnd)
+        self.display_size = monitor_info["Work"]
+        self.monitor_size = monitor_info["Monitor"]
         self.is_primary = self._is_primary_display()
 
-    def _get_display_size(self):
-        return win32api.GetMonitorInfo(self.hwnd)["Work"]
-
     def _is_primary_display(self):
-        primary_hwnd = win32api.MonitorFromPoint(
-            (0, 0), win32con.MONITOR_DEFAULTTOPRIMARY)
+        primary_hwnd = win32.MonitorFromPoint((0, 0))
         return primary_hwnd == self.hwnd
 
+    def contains_rect(self, size):
+        """returns True if size lies entirely within this display's monitor"""
+        l, t, r, b = self.monitor_size
+        return size[0] >= l and size[1] >= t and size[2] <= r and size[3] <= b
+
     def contains_window(self, window_hwnd):
-        hwnd = win32api.MonitorFromWindow(
-            window_hwnd, win32con.MONITOR_DEFAULTTONEAREST)
+        hwnd = win32.MonitorFromWindow(window_hwnd)
         return hwnd == self.hwnd
@@ -0,0 +1,166 @@
+import asyncio
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from wimpy import metrics
+
+# lower runs first, work of the same priority runs in submission order
+PRIORITY_EVENT = 0  # event bookkeeping and user commands, cheap and order sensitive
+PRIORITY_FOREGROUND = 1  # relayout of the display showing the foreground window
+PRIORITY_BACKGROUND = 2  # relayout of any other display
+PRIORITY_HOUSEKEEPING = 3  # refreshes and sweeps
+
+PRIORITY_NAMES = {
+    PRIORITY_EVENT: "event",
+    PRIORITY_FOREGROUND: "foreground",
+    PRIORITY_BACKGROUND: "background",
+    PRIORITY_HOUSEKEEPING: "housekeeping"
+}
+
+
+class LayoutWorker(object):
+    """Runs all window management work on one asyncio thread, by priority
+
+    Any thread may submit work; the event hook only enqueues and returns. Until
+    start() is called (or after stop()) work stays queued for run_pending()."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+
+        self._queue = []  # heap of (priority, sequence, submit time, func, args)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._thread = None
+        self._ready = threading.Event()
+
+        # counters
+        self.dispatched = collections.Counter()  # priority -> count
+        self.max_lag = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="wimpy-layout", daemon=True)
+        logging.debug("Starting layout worker thread (%s).", self._thread.name)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        """stops the worker thread, unfinished work stays queued"""
+        thread = self._thread
+        if thread is None:
+            return
+        logging.debug("Stopping layout worker")
+        loop = self._loop
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None
+
+    def on_worker_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, priority, func, *args):
+        """queues func(*args), callable from any thread"""
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(
+                self._sequence), self.clock(), func, args))
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # stopped meanwhile, the item stays queued
+                pass
+
+    def call(self, func, *args):
+        """runs func(*args) on the worker and waits for its result"""
+        if not self.is_running() or self.on_worker_thread():
+            return func(*args)
+
+        future = concurrent.futures.Future()
+
+        def _call():
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        self.submit(PRIORITY_EVENT, _call)
+        return future.result()
+
+    def call_later(self, delay, func, *args):
+        """runs func(*args) on the worker after delay seconds, ignored while the worker is stopped"""
+        loop = self._loop
+        if loop is None:
+            return
+        if self.on_worker_thread():
+            loop.call_later(max(delay, 0), func, *args)
+        else:
+            loop.call_soon_threadsafe(
+                loop.call_later, max(delay, 0), func, *args)
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def run_pending(self):
+        """runs all queued work on the calling thread, returns the number of items run"""
+        count = 0
+        while self._run_next():
+            count += 1
+        return count
+
+    def _run_next(self):
+        with self._lock:
+            if len(self._queue) == 0:
+                return False
+            priority, _, submitted, func, args = heapq.heappop(self._queue)
+
+        lag = self.clock() - submitted
+        self.dispatched[priority] += 1
+        self.max_lag = max(self.max_lag, lag)
+        metrics.observe("dispatch_lag_seconds", lag, PRIORITY_NAMES.get(priority))
+        try:
+            func(*args)
+        except:
+            logging.error("Error in layout worker running %s:",
+                          getattr(func, "__name__", func), exc_info=True)
+        return True
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_event_loop()
+        self._ready.set()
+        while True:
+            # yield between items so timers and newly submitted work of higher priority get in
+            while self._run_next():
+                await asyncio.sleep(0)
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        task = loop.create_task(self._main())
+        try:
+            loop.run_forever()
+        finally:
+            self._loop = None
+            task.cancel()
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+            loop.close()
@@ -0,0 +1,52 @@
+import time
+
+
+class MoveEchoes(object):
+    """Rects of the moves wimpy just made, to recognise the location changes they cause
+
+    Location changes of a moved window within timeout are taken for echoes of the
+    move and dropped without querying the window. Once an entry expires, windows
+    whose echo was dropped are checked with a single rect query, so a window that
+    took another rect than requested is still noticed."""
+
+    def __init__(self, timeout, clock=time.monotonic):
+        """timeout is in seconds"""
+        self.timeout = timeout
+        self.clock = clock
+        self._expected = {}  # hwnd -> [rect, deadline, echoed]
+
+        # counters
+        self.suppressed = 0
+
+    def expect(self, hwnd, rect):
+        """records a move of hwnd to rect"""
+        self._expected[hwnd] = [rect, self.clock() + self.timeout, False]
+
+    def is_echo(self, hwnd):
+        """returns True (and counts it) if a location change of hwnd is the echo of a recent move"""
+        entry = self._expected.get(hwnd)
+        if entry is None or self.clock() > entry[1]:
+            return False
+        entry[2] = True
+        self.suppressed += 1
+        return True
+
+    def discard(self, hwnd):
+        self._expected.pop(hwnd, None)
+
+    def pop_expired(self, force=False):
+        """removes the expired entries (all with force), returns [(hwnd, rect)] of those whose echo was dropped"""
+        now = self.clock()
+        echoed = []
+        for hwnd, (rect, deadline, was_echoed) in list(self._expected.items()):
+            if force or now > deadline:
+                del self._expected[hwnd]
+                if was_echoed:
+                    echoed.append((hwnd, rect))
+        return echoed
+
+    def __contains__(self, hwnd):
+        return hwnd in self._expected
+
+    def __len__(self):
+        return len(self._expected)
@@ -0,0 +1,191 @@
+import ctypes
+import ctypes.wintypes
+import logging
+import pywintypes
+import win32api
+import win32con
+import win32gui
+import win32process
+
+from wimpy.Backend import Backend
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+MAX_PATH = 260
+
+
+class NativeBackend(Backend):
+    """Backend calling the Windows API through pywin32 and ctypes"""
+
+    def __init__(self):
+        self.user32 = ctypes.windll.user32
+        self.ole32 = ctypes.windll.ole32
+        self.kernel32 = ctypes.windll.kernel32
+        self.kernel32.OpenProcess.restype = ctypes.wintypes.HANDLE
+        self.user32.SetWinEventHook.restype = ctypes.wintypes.HANDLE
+
+        self.WinEventProcType = ctypes.WINFUNCTYPE(
+            None,
+            ctypes.wintypes.HANDLE,
+            ctypes.wintypes.DWORD,
+            ctypes.wintypes.HWND,
+            ctypes.wintypes.LONG,
+            ctypes.wintypes.LONG,
+            ctypes.wintypes.DWORD,
+            ctypes.wintypes.DWORD)
+        self._procs = {}  # callback -> WinEventProc, must outlive the hooks
+
+    def EnumDisplayMonitors(self):
+        hwnds = []
+        for hwnd, _, _ in win32api.EnumDisplayMonitors():
+            hwnds.append(hwnd)
+
+        return hwnds
+
+    def GetMonitorInfo(self, hmonitor):
+        return win32api.GetMonitorInfo(hmonitor)
+
+    def MonitorFromPoint(self, point):
+        return win32api.MonitorFromPoint(point, win32con.MONITOR_DEFAULTTOPRIMARY)
+
+    def MonitorFromWindow(self, hwnd):
+        return win32api.MonitorFromWindow(hwnd, win32con.MONITOR_DEFAULTTONEAREST)
+
+    def EnumWindows(self):
+        def _cb(hwnd, handles):
+            handles.append(hwnd)
+
+        hwnds = []
+        win32gui.EnumWindows(_cb, hwnds)
+        return hwnds
+
+    def GetForegroundWindow(self):
+        return win32gui.GetForegroundWindow()
+
+    def GetWindowClassName(self, hwnd):
+        return win32gui.GetClassName(hwnd)
+
+    def GetWindowRect(self, hwnd):
+        return win32gui.GetWindowRect(hwnd)
+
+    def GetWindowStyles(self, hwnd):
+        return win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
+
+    def GetWindowExStyles(self, hwnd):
+        return win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
+
+    def GetWindowText(self, hwnd):
+        return win32gui.GetWindowText(hwnd)
+
+    def GetWindowProcessId(self, hwnd):
+        return win32process.GetWindowThreadProcessId(hwnd)[1]
+
+    def IsIconic(self, hwnd):
+        return win32gui.IsIconic(hwnd)
+
+    def IsHungAppWindow(self, hwnd):
+        return bool(self.user32.IsHungAppWindow(hwnd))
+
+    def IsWindow(self, hwnd):
+        return win32gui.IsWindow(hwnd)
+
+    def IsWindowVisible(self, hwnd):
+        return win32gui.IsWindowVisible(hwnd)
+
+    def IsZoomed(self, hwnd):
+        return self.user32.IsZoomed(hwnd)
+
+    def MoveWindow(self, hwnd, x, y, cx, cy, repaint):
+        try:
+            return win32gui.MoveWindow(hwnd, x, y, cx, cy, repaint)
+        except pywintypes.error as err:
+            winerr, funcname, message = err.args
+            logging.error("%s (%s): %s", funcname, winerr, message)
+
+    def SetWindowPos(self, hwnd, hwnd_insert_after, x, y, cx, cy, u_flags):
+        try:
+            return win32gui.SetWindowPos(hwnd, hwnd_insert_after, x, y, cx, cy, u_flags)
+        except pywintypes.error as err:
+            winerr, funcname, message = err.args
+            logging.error("%s (%s): %s", funcname, winerr, message)
+
+    def SendMessageTimeout(self, hwnd, message, timeout):
+        result = ctypes.c_size_t()
+        return self.user32.SendMessageTimeoutW(
+            hwnd, message, 0, 0, win32con.SMTO_ABORTIFHUNG, timeout, ctypes.byref(result)) != 0
+
+    def DeferWindowPositions(self, positions):
+        flags = win32con.SWP_NOZORDER | win32con.SWP_NOACTIVATE | win32con.SWP_NOOWNERZORDER
+        try:
+            hdwp = win32gui.BeginDeferWindowPos(len(positions))
+            for hwnd, (l, t, r, b) in positions:
+                hdwp = win32gui.DeferWindowPos(
+                    hdwp, hwnd, 0, l, t, r - l, b - t, flags)
+            win32gui.EndDeferWindowPos(hdwp)
+            return True
+        except pywintypes.error as err:
+            winerr, funcname, message = err.args
+            logging.error("%s (%s): %s", funcname, winerr, message)
+
+        # a single invalid hwnd aborts the whole transaction, fall back to individual moves
+        for hwnd, (l, t, r, b) in positions:
+            self.MoveWindow(hwnd, l, t, r - l, b - t, True)
+        return False
+
+    def GetProcessImageName(self, pid):
+        # limited information is enough for the image name and granted for elevated processes
+        handle = self.kernel32.OpenProcess(
+            PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            size = ctypes.wintypes.DWORD(MAX_PATH)
+            buffer = ctypes.create_unicode_buffer(size.value)
+            if not self.kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+                return None
+            return buffer.value
+        finally:
+            self.kernel32.CloseHandle(handle)
+
+    def GetTickCount(self):
+        return win32api.GetTickCount()
+
+    def SetWinEventHook(self, event_min, event_max, callback, err_callback):
+        proc = self._procs.get(callback)
+        if proc is None:
+            proc = self._procs[callback] = self.WinEventProcType(callback)
+        if err_callback is not None:
+            self.user32.SetWinEventHook.errcheck = err_callback
+
+        return self.user32.SetWinEventHook(
+            event_min,
+            event_max,
+            0,
+            proc,
+            0,
+            0,
+            win32con.WINEVENT_OUTOFCONTEXT | win32con.WINEVENT_SKIPOWNPROCESS)
+
+    def UnhookWinEvent(self, hook):
+        return self.user32.UnhookWinEvent(hook)
+
+    def RunMessageLoop(self, on_start, on_thread_message, on_stop):
+        self.ole32.CoInitialize(0)
+        message = ctypes.wintypes.MSG()
+
+        # make sure the thread has a message queue before anything is posted to it
+        self.user32.PeekMessageW(ctypes.byref(message), 0, 0,
+                                 0, win32con.PM_NOREMOVE)
+        on_start()
+
+        while self.user32.GetMessageW(ctypes.byref(message), 0, 0, 0) != 0:
+            if message.hWnd is None:
+                on_thread_message(message.message)
+                continue
+            self.user32.TranslateMessage(ctypes.byref(message))
+            self.user32.DispatchMessageW(ctypes.byref(message))
+
+        on_stop()
+        self.ole32.CoUninitialize()
+
+    def PostThreadMessage(self, thread_id, message):
+        return self.user32.PostThreadMessageW(thread_id, message, 0, 0)
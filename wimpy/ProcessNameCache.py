@@ -0,0 +1,61 @@
+import logging
+import ntpath
+
+import wimpy.win32 as win32
+
+
+class ProcessNameCache(object):
+    """Executable names of window processes, cached by process id
+
+    A name is kept while its process has known windows. Once the last of them is
+    released the process has usually exited, and its pid may be reused."""
+
+    def __init__(self):
+        self._names = {}  # pid -> lowercase executable name, "" if it cannot be queried
+        self._pids = {}  # hwnd -> pid
+        self._windows = {}  # pid -> set of hwnds
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def name(self, hwnd):
+        """returns the lowercase executable name of hwnd's process, e.g. notepad.exe"""
+        pid = self._pids.get(hwnd)
+        if pid is None:
+            pid = win32.GetWindowProcessId(hwnd)
+            self._pids[hwnd] = pid
+            self._windows.setdefault(pid, set()).add(hwnd)
+
+        name = self._names.get(pid)
+        if name is not None:
+            self.hits += 1
+            return name
+
+        self.misses += 1
+        path = win32.GetProcessImageName(pid)
+        name = ntpath.basename(path).lower() if path else ""
+        self._names[pid] = name
+        logging.debug("[%s] Process %d is '%s'.", hwnd, pid, name)
+        return name
+
+    def release(self, hwnd):
+        """forgets hwnd, and its process' name once the process has no windows left"""
+        pid = self._pids.pop(hwnd, None)
+        if pid is None:
+            return
+        windows = self._windows[pid]
+        windows.discard(hwnd)
+        if len(windows) == 0:
+            del self._windows[pid]
+            if self._names.pop(pid, None) is not None:
+                self.evictions += 1
+
+    def clear(self):
+        self._names.clear()
+        self._pids.clear()
+        self._windows.clear()
+
+    def __len__(self):
+        return len(self._names)
@@ -0,0 +1,132 @@
+import collections
+import logging
+import threading
+import time
+
+from wimpy import metrics
+from wimpy.LayoutWorker import PRIORITY_BACKGROUND
+
+
+class RelayoutScheduler(object):
+    """Coalesces relayout requests so each display is laid out at most once per quiet period"""
+
+    def __init__(self, callback, quiet_time, max_latency, clock=time.monotonic, priority=None):
+        """callback(display, event_count, reason) runs on the worker once a relayout is due
+
+        quiet_time and max_latency are in milliseconds, clock returns seconds.
+        priority(display) returns the LayoutWorker priority of a due relayout."""
+        self.callback = callback
+        self.clock = clock
+        self.quiet_time = quiet_time / 1000
+        self.max_latency = max_latency / 1000
+        self.priority = priority or (lambda display: PRIORITY_BACKGROUND)
+
+        self._pending = {}  # display -> [first event time, last event time, event count, reason]
+        self._lock = threading.Lock()
+        self._worker = None
+        self._armed = None  # deadline of the earliest timer set on the worker
+
+        # counters
+        self.relayouts = 0
+        self.events_coalesced = 0
+        self.coalesced_histogram = collections.Counter()
+
+    def start(self, worker):
+        """submits due relayouts to worker from now on"""
+        self._worker = worker
+        self._armed = None
+        self._arm()
+
+    def stop(self):
+        """stops submitting relayouts, they are only run by run_due() and flush()"""
+        self._worker = None
+        self._armed = None
+
+    def mark_dirty(self, display, now=None, reason=None):
+        """requests a relayout of display, coalescing with any pending request
+
+        reason names the event that first dirtied the display, it labels the latency metrics"""
+        if now is None:
+            now = self.clock()
+
+        with self._lock:
+            pending = self._pending.get(display)
+            if pending is None:
+                self._pending[display] = [now, now, 1, reason]
+            else:
+                pending[1] = now
+                pending[2] += 1
+        self._arm()
+
+    def cancel(self, display):
+        with self._lock:
+            self._pending.pop(display, None)
+
+    def next_deadline(self):
+        """returns the time the next relayout is due, or None if nothing is pending"""
+        with self._lock:
+            deadlines = [self._deadline(p) for p in self._pending.values()]
+        return min(deadlines) if len(deadlines) > 0 else None
+
+    def pop_due(self, now=None):
+        """removes and returns [(display, pending)] for all relayouts due at now"""
+        if now is None:
+            now = self.clock()
+
+        with self._lock:
+            due = [(display, p) for display, p in self._pending.items()
+                   if self._deadline(p) <= now]
+            for display, _ in due:
+                del self._pending[display]
+        return due
+
+    def run_due(self, now=None):
+        """runs the relayouts due at now on the calling thread"""
+        self._dispatch(self.pop_due(now))
+
+    def flush(self):
+        """immediately runs all pending relayouts on the calling thread"""
+        with self._lock:
+            due = list(self._pending.items())
+            self._pending.clear()
+        self._dispatch(due)
+
+    def _deadline(self, pending):
+        first, last, _, _ = pending
+        return min(last + self.quiet_time, first + self.max_latency)
+
+    def _arm(self):
+        """sets a worker timer for the earliest deadline unless an earlier one is set"""
+        worker = self._worker
+        deadline = self.next_deadline()
+        if worker is None or deadline is None:
+            return
+        if self._armed is not None and self._armed <= deadline:
+            return
+        self._armed = deadline
+        worker.call_later(deadline - self.clock(), self._on_timer)
+
+    def _on_timer(self):
+        worker = self._worker
+        if worker is None:
+            return
+        self._armed = None
+        for item in self.pop_due():
+            worker.submit(self.priority(item[0]), self._dispatch, [item])
+        self._arm()
+
+    def _dispatch(self, due):
+        for display, (first, _, event_count, reason) in due:
+            self.relayouts += 1
+            self.events_coalesced += event_count
+            self.coalesced_histogram[event_count] += 1
+            logging.debug("Relayout of display [%s] coalesced %d event(s).",
+                          int(display.hwnd), event_count)
+            try:
+                self.callback(display, event_count, reason)
+            except:
+                logging.error("Error in relayout of display [%s]:",
+                              int(display.hwnd), exc_info=True)
+            metrics.observe("relayout_latency_seconds",
+                            self.clock() - first, reason)
+            metrics.record_relayout()
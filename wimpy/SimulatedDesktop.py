@@ -0,0 +1,393 @@
+import collections
+import queue
+import threading
+
+import wimpy.win32 as win32
+
+from wimpy.Backend import Backend
+
+# style of a regular, resizable top-level window
+DEFAULT_STYLE = win32.WS_OVERLAPPEDWINDOW | win32.WS_VISIBLE | win32.WS_CLIPCHILDREN
+
+
+class SimulatedError(Exception):
+    """Raised for calls on windows that do not exist"""
+
+
+class SimulatedWindow(object):
+    """State of a single window on a SimulatedDesktop"""
+
+    def __init__(self, hwnd, rect, title, classname, style, exstyle, pid=0):
+        self.hwnd = hwnd
+        self.pid = pid
+        self.rect = rect
+        self.title = title
+        self.classname = classname
+        self.style = style
+        self.exstyle = exstyle
+        self.hung = False
+        self.posted_rect = None  # asynchronous move waiting for a hung window to respond
+        # size limits the application enforces on moves, see SimulatedDesktop.constrain_window
+        self.min_size = None
+        self.max_size = None
+        self.grid = None
+
+    def constrain(self, rect):
+        """returns the rect the application takes when asked for rect"""
+        l, t, r, b = rect
+        width, height = r - l, b - t
+        if self.grid is not None:
+            width -= width % self.grid[0]
+            height -= height % self.grid[1]
+        if self.min_size is not None:
+            width, height = max(width, self.min_size[0]), max(height, self.min_size[1])
+        if self.max_size is not None:
+            width, height = min(width, self.max_size[0]), min(height, self.max_size[1])
+        return (l, t, l + width, t + height)
+
+    @property
+    def visible(self):
+        return bool(self.style & win32.WS_VISIBLE)
+
+    @property
+    def iconic(self):
+        return bool(self.style & win32.WS_MINIMIZE)
+
+    @property
+    def zoomed(self):
+        return bool(self.style & win32.WS_MAXIMIZE)
+
+
+class SimulatedDesktop(Backend):
+    """In-memory desktop implementing the wimpy.win32 backend interface
+
+    Changes made by the simulation (create_window, move_window, ...) and by backend
+    calls queue the WinEvents Windows would send. They are delivered to hooks by
+    pump(), on the calling thread, so runs are deterministic. Every backend call is
+    counted in calls."""
+
+    def __init__(self, monitors=((0, 0, 1920, 1080),), taskbar_height=40, work_areas=None):
+        """monitors are (l, t, r, b) rects, the first one is the primary monitor
+
+        work_areas defaults to the monitor rects minus a taskbar at the bottom"""
+        if work_areas is None:
+            work_areas = [(l, t, r, b - taskbar_height)
+                          for l, t, r, b in monitors]
+        self.monitors = collections.OrderedDict()  # hmonitor -> (monitor rect, work rect)
+        for i, (monitor, work) in enumerate(zip(monitors, work_areas)):
+            self.monitors[0x10001 + i] = (tuple(monitor), tuple(work))
+        self.windows = {}  # hwnd -> SimulatedWindow
+        self.processes = {}  # pid -> executable path
+        self.z_order = []  # hwnds, topmost first
+        self.foreground = None
+        self.time = 0  # milliseconds, used as dwmsEventTime
+
+        self.calls = collections.Counter()
+        self.pending_events = collections.deque()
+        self.hooks = {}  # hook -> (event_min, event_max, callback)
+        self.blocked_calls = 0  # synchronous calls that would have waited for a hung window
+
+        self._next_hwnd = 0x10000
+        self._next_pid = 1000
+        self._next_hook = 1
+        self._queues = {}  # thread id -> queue.Queue
+        self._lock = threading.Lock()
+
+    # simulation
+
+    def create_window(self, rect, title="", classname="SimulatedWindow", style=DEFAULT_STYLE, exstyle=0, hwnd=None, pid=None):
+        """pid defaults to a process of its own, see start_process"""
+        with self._lock:
+            if hwnd is None:
+                hwnd = self._next_hwnd
+            self._next_hwnd = max(self._next_hwnd, hwnd) + 4
+        if pid is None:
+            pid = self.start_process()
+        window = SimulatedWindow(hwnd, tuple(rect), title,
+                                 classname, style, exstyle, pid)
+        self.windows[hwnd] = window
+        self.z_order.insert(0, hwnd)
+        self.queue_event(win32.EVENT_OBJECT_CREATE, hwnd)
+        if window.visible:
+            self.foreground = hwnd
+            self.queue_event(win32.EVENT_OBJECT_SHOW, hwnd)
+        return hwnd
+
+    def destroy_window(self, hwnd):
+        window = self._get(hwnd)
+        if window.visible:
+            self.queue_event(win32.EVENT_OBJECT_HIDE, hwnd)
+        del self.windows[hwnd]
+        self.z_order.remove(hwnd)
+        if self.foreground == hwnd:
+            self.foreground = self.z_order[0] if len(
+                self.z_order) > 0 else None
+        self.queue_event(win32.EVENT_OBJECT_DESTROY, hwnd)
+
+    def start_process(self, path="C:\\Program Files\\Simulated\\simulated.exe"):
+        """returns the pid of a new process, windows of the same process share it"""
+        with self._lock:
+            pid = self._next_pid
+            self._next_pid += 4
+        self.processes[pid] = path
+        return pid
+
+    def exit_process(self, pid):
+        """destroys the process' windows and ends it, its pid may be reused"""
+        for hwnd in [h for h, w in self.windows.items() if w.pid == pid]:
+            self.destroy_window(hwnd)
+        del self.processes[pid]
+
+    def move_window(self, hwnd, rect):
+        """moves a window as if the user dragged it"""
+        self.queue_event(win32.EVENT_SYSTEM_MOVESIZESTART, hwnd)
+        self._set_rect(self._get(hwnd), rect)
+        self.queue_event(win32.EVENT_SYSTEM_MOVESIZEEND, hwnd)
+
+    def set_title(self, hwnd, title):
+        self._get(hwnd).title = title
+        self.queue_event(win32.EVENT_OBJECT_NAMECHANGE, hwnd)
+
+    def set_window_state(self, hwnd, rect, style, exstyle):
+        """overwrites a window's state without queueing events"""
+        window = self._get(hwnd)
+        window.rect = tuple(rect)
+        window.style = style
+        window.exstyle = exstyle
+
+    def hang_window(self, hwnd, hung=True):
+        """makes a window stop (or resume) processing messages
+
+        Synchronous moves of a hung window are counted in blocked_calls; asynchronous
+        moves are applied once it resumes."""
+        window = self._get(hwnd)
+        window.hung = hung
+        if not hung and window.posted_rect is not None:
+            self._set_rect(window, window.posted_rect)
+            window.posted_rect = None
+
+    def constrain_window(self, hwnd, min_size=None, max_size=None, grid=None):
+        """makes the window enforce (width, height) limits, or snap its size to a grid, on moves"""
+        window = self._get(hwnd)
+        window.min_size = min_size
+        window.max_size = max_size
+        window.grid = grid
+
+    def minimize_window(self, hwnd):
+        window = self._get(hwnd)
+        window.style |= win32.WS_MINIMIZE
+        self.queue_event(win32.EVENT_SYSTEM_MINIMIZESTART, hwnd)
+        self.queue_event(win32.EVENT_OBJECT_LOCATIONCHANGE, hwnd)
+
+    def restore_window(self, hwnd):
+        window = self._get(hwnd)
+        window.style &= ~win32.WS_MINIMIZE
+        self.foreground = hwnd
+        self.queue_event(win32.EVENT_SYSTEM_MINIMIZEEND, hwnd)
+        self.queue_event(win32.EVENT_OBJECT_LOCATIONCHANGE, hwnd)
+
+    def queue_event(self, event, hwnd, id_object=win32.OBJID_WINDOW, id_child=0):
+        self.time += 1
+        self.pending_events.append(
+            (event, hwnd, id_object, id_child, 0, self.time))
+
+    def pump(self, limit=None):
+        """delivers queued events to the installed hooks, returns the number delivered"""
+        count = 0
+        while len(self.pending_events) > 0 and (limit is None or count < limit):
+            event, hwnd, id_object, id_child, thread, time = self.pending_events.popleft()
+            for hook, (event_min, event_max, callback) in list(self.hooks.items()):
+                if event_min <= event <= event_max:
+                    callback(hook, event, hwnd, id_object,
+                             id_child, thread, time)
+            count += 1
+        return count
+
+    # monitors
+
+    def EnumDisplayMonitors(self):
+        self.calls["EnumDisplayMonitors"] += 1
+        return list(self.monitors.keys())
+
+    def GetMonitorInfo(self, hmonitor):
+        self.calls["GetMonitorInfo"] += 1
+        monitor, work = self.monitors[hmonitor]
+        return {"Monitor": monitor, "Work": work, "Flags": 1 if hmonitor == self._primary() else 0}
+
+    def MonitorFromPoint(self, point):
+        self.calls["MonitorFromPoint"] += 1
+        x, y = point
+        for hmonitor, ((l, t, r, b), _) in self.monitors.items():
+            if l <= x < r and t <= y < b:
+                return hmonitor
+        return self._primary()
+
+    def MonitorFromWindow(self, hwnd):
+        self.calls["MonitorFromWindow"] += 1
+        wl, wt, wr, wb = self._get(hwnd).rect
+
+        def _distance(item):
+            (l, t, r, b), _ = item[1]
+            overlap = max(0, min(wr, r) - max(wl, l)) * \
+                max(0, min(wb, b) - max(wt, t))
+            gap = max(l - wr, wl - r, 0) + max(t - wb, wt - b, 0)
+            return (-overlap, gap)
+
+        return min(self.monitors.items(), key=_distance)[0]
+
+    # windows
+
+    def EnumWindows(self):
+        self.calls["EnumWindows"] += 1
+        return list(self.z_order)
+
+    def GetForegroundWindow(self):
+        self.calls["GetForegroundWindow"] += 1
+        return self.foreground
+
+    def GetWindowClassName(self, hwnd):
+        self.calls["GetWindowClassName"] += 1
+        return self._get(hwnd).classname
+
+    def GetWindowRect(self, hwnd):
+        self.calls["GetWindowRect"] += 1
+        return self._get(hwnd).rect
+
+    def GetWindowStyles(self, hwnd):
+        self.calls["GetWindowStyles"] += 1
+        return self._get(hwnd).style
+
+    def GetWindowExStyles(self, hwnd):
+        self.calls["GetWindowExStyles"] += 1
+        return self._get(hwnd).exstyle
+
+    def GetWindowText(self, hwnd):
+        self.calls["GetWindowText"] += 1
+        return self._get(hwnd).title
+
+    def GetWindowProcessId(self, hwnd):
+        self.calls["GetWindowProcessId"] += 1
+        return self._get(hwnd).pid
+
+    def GetProcessImageName(self, pid):
+        self.calls["GetProcessImageName"] += 1
+        return self.processes.get(pid)
+
+    def IsIconic(self, hwnd):
+        self.calls["IsIconic"] += 1
+        return self._get(hwnd).iconic
+
+    def IsHungAppWindow(self, hwnd):
+        self.calls["IsHungAppWindow"] += 1
+        return self._get(hwnd).hung
+
+    def IsWindow(self, hwnd):
+        self.calls["IsWindow"] += 1
+        return hwnd in self.windows
+
+    def IsWindowVisible(self, hwnd):
+        self.calls["IsWindowVisible"] += 1
+        return self._get(hwnd).visible
+
+    def IsZoomed(self, hwnd):
+        self.calls["IsZoomed"] += 1
+        return self._get(hwnd).zoomed
+
+    def MoveWindow(self, hwnd, x, y, cx, cy, repaint):
+        self.calls["MoveWindow"] += 1
+        window = self._get(hwnd)
+        if window.hung:
+            self.blocked_calls += 1
+        self._set_rect(window, window.constrain((x, y, x + cx, y + cy)))
+        return True
+
+    def SetWindowPos(self, hwnd, hwnd_insert_after, x, y, cx, cy, u_flags):
+        self.calls["SetWindowPos"] += 1
+        window = self._get(hwnd)
+        if hwnd_insert_after == win32.HWND_TOPMOST:
+            window.exstyle |= win32.WS_EX_TOPMOST
+        elif hwnd_insert_after == win32.HWND_NOTOPMOST:
+            window.exstyle &= ~win32.WS_EX_TOPMOST
+
+        l, t, r, b = window.rect
+        if not u_flags & win32.SWP_NOMOVE:
+            l, t, r, b = x, y, x + (r - l), y + (b - t)
+        if not u_flags & win32.SWP_NOSIZE:
+            r, b = l + cx, t + cy
+        if not u_flags & win32.SWP_NOSIZE:
+            l, t, r, b = window.constrain((l, t, r, b))
+        if window.hung:
+            if u_flags & win32.SWP_ASYNCWINDOWPOS:
+                window.posted_rect = (l, t, r, b)
+                return True
+            self.blocked_calls += 1
+        self._set_rect(window, (l, t, r, b))
+        return True
+
+    def SendMessageTimeout(self, hwnd, message, timeout):
+        self.calls["SendMessageTimeout"] += 1
+        return not self._get(hwnd).hung
+
+    def DeferWindowPositions(self, positions):
+        self.calls["DeferWindowPositions"] += 1
+        windows = [self._get(hwnd) for hwnd, _ in positions]
+        self.blocked_calls += sum(1 for w in windows if w.hung)
+        for window, (_, rect) in zip(windows, positions):
+            self._set_rect(window, window.constrain(rect))
+        return True
+
+    # events
+
+    def GetTickCount(self):
+        self.calls["GetTickCount"] += 1
+        return self.time
+
+    def SetWinEventHook(self, event_min, event_max, callback, err_callback):
+        self.calls["SetWinEventHook"] += 1
+        with self._lock:
+            hook = self._next_hook
+            self._next_hook += 1
+            self.hooks[hook] = (event_min, event_max, callback)
+        return hook
+
+    def UnhookWinEvent(self, hook):
+        self.calls["UnhookWinEvent"] += 1
+        with self._lock:
+            return self.hooks.pop(hook, None) is not None
+
+    def RunMessageLoop(self, on_start, on_thread_message, on_stop):
+        thread_id = threading.get_ident()
+        messages = self._queues[thread_id] = queue.Queue()
+        try:
+            on_start()
+            while True:
+                message = messages.get()
+                if message == win32.WM_QUIT:
+                    break
+                on_thread_message(message)
+            on_stop()
+        finally:
+            del self._queues[thread_id]
+
+    def PostThreadMessage(self, thread_id, message):
+        self.calls["PostThreadMessage"] += 1
+        messages = self._queues.get(thread_id)
+        if messages is None:
+            return False
+        messages.put(message)
+        return True
+
+    def _get(self, hwnd):
+        window = self.windows.get(hwnd)
+        if window is None:
+            raise SimulatedError(f"Invalid window handle: {hwnd}")
+        return window
+
+    def _primary(self):
+        return next(iter(self.monitors))
+
+    def _set_rect(self, window, rect):
+        rect = tuple(rect)
+        if window.rect != rect:
+            window.rect = rect
+            self.queue_event(win32.EVENT_OBJECT_LOCATIONCHANGE, window.hwnd)
@@ -0,0 +1,64 @@
+import threading
+
+
+class TrayMenuModel(object):
+    """Window entries of the tray menu, grouped by display and kept in sync with a WindowRegistry
+
+    Registry changes arrive on the layout worker and only record which displays
+    changed; the tray applies those when the menu opens. Every entry gets a slot,
+    a small integer the tray maps to a menu id. Slots of removed windows are reused,
+    so their number is bounded by the most windows tracked at once. Entries hold
+    handles, never Windows."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._displays = {}  # display hwnd -> {slot: hwnd}
+        self._slots = {}  # hwnd -> slot
+        self._handles = {}  # slot -> hwnd
+        self._free_slots = []
+        self._dirty = set()  # display hwnds changed since take_changes()
+        self.slot_count = 0
+
+    def on_display_changed(self, hwnd, old_display_hwnd, new_display_hwnd):
+        """WindowRegistry listener"""
+        with self._lock:
+            if old_display_hwnd is not None:
+                slot = self._slots.pop(hwnd, None)
+                if slot is not None:
+                    del self._displays[old_display_hwnd][slot]
+                    del self._handles[slot]
+                    self._free_slots.append(slot)
+                    self._dirty.add(old_display_hwnd)
+            if new_display_hwnd is not None:
+                slot = self._allocate_slot()
+                self._slots[hwnd] = slot
+                self._handles[slot] = hwnd
+                self._displays.setdefault(new_display_hwnd, {})[slot] = hwnd
+                self._dirty.add(new_display_hwnd)
+
+    def take_changes(self):
+        """returns {display hwnd: {slot: hwnd}} of the displays changed since the last call"""
+        with self._lock:
+            changes = {display_hwnd: dict(self._displays.get(display_hwnd, {}))
+                       for display_hwnd in self._dirty}
+            self._dirty.clear()
+            for display_hwnd in changes:
+                if len(changes[display_hwnd]) == 0:
+                    self._displays.pop(display_hwnd, None)
+            return changes
+
+    def entries(self, display_hwnd):
+        """returns {slot: hwnd} of display_hwnd"""
+        with self._lock:
+            return dict(self._displays.get(display_hwnd, {}))
+
+    def hwnd(self, slot):
+        """returns the window of slot, or None if it is gone"""
+        with self._lock:
+            return self._handles.get(slot)
+
+    def _allocate_slot(self):
+        if len(self._free_slots) > 0:
+            return self._free_slots.pop()
+        self.slot_count += 1
+        return self.slot_count - 1
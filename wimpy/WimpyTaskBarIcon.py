@@ -2,55 +2,143 @@ import os
 import wx
 import wx.adv
 
+import wimpy.metrics as metrics
+import wimpy.profiling as profiling
+
+from wimpy.TrayMenuModel import TrayMenuModel
+
+MAX_LABEL_LENGTH = 42
+
 
 class WimpyTaskBarIcon(wx.adv.TaskBarIcon):
-    """TaskBarIcon for wimpy"""
+    """TaskBarIcon for wimpy
+
+    The menu is built once and kept. Window entries live in one submenu per
+    display, only the submenus of displays whose windows changed are updated when
+    the menu opens, and titles only when a submenu opens."""
 
     def __init__(self, program_name, icon_path, window_manager):
         super(wx.adv.TaskBarIcon, self).__init__()
         self.Bind(wx.adv.EVT_TASKBAR_LEFT_DOWN, self._refresh)
+        self.Bind(wx.adv.EVT_TASKBAR_CLICK, self._show_menu)
+        self.Bind(wx.EVT_MENU_OPEN, self._on_menu_open)
 
         self.program_name = program_name
         self.window_manager = window_manager
         self._set_icon(icon_path, self.program_name)
 
-        self.window_mapping = {}
+        self.model = TrayMenuModel()
+        self._slot_ids = []  # slot -> menu id, ids are bound once and reused
+        self._slot_of_id = {}  # menu id -> slot
+        self._submenus = {}  # display hwnd -> (submenu, item in the menu, set of slots)
+        self.menu = self._create_menu()
+        window_manager.subscribe_windows(self.model.on_display_changed)
 
-    def CreatePopupMenu(self):
-        """Creates the right-click menu for the TaskBarIcon."""
+    def _create_menu(self):
         menu = wx.Menu()
 
         # label
-        label_item = menu.Append(wx.NewIdRef(), "wimpy")
+        label_item = menu.Append(wx.ID_ANY, "wimpy")
         label_item.Enable(False)
 
         menu.AppendSeparator()
 
         # refresh
-        refresh_item = menu.Append(wx.NewIdRef(), "Refresh")
+        refresh_item = menu.Append(wx.ID_ANY, "Refresh")
         self.Bind(wx.EVT_MENU, self._refresh, refresh_item)
 
-        menu.AppendSeparator()
+        # rebalance
+        rebalance_item = menu.Append(wx.ID_ANY, "Rebalance")
+        self.Bind(wx.EVT_MENU, self._rebalance, rebalance_item)
+
+        # statistics, metrics can be turned on and off by reloading the config
+        self._statistics_item = menu.Append(wx.ID_ANY, "Statistics")
+        self.Bind(wx.EVT_MENU, self._show_statistics, self._statistics_item)
 
-        # window toggles
-        for window in self.window_manager.windows:
-            raw_label = str(window)
-            label = raw_label if len(
-                raw_label) < 42 else raw_label[:39] + "..."
-            window_item = menu.AppendCheckItem(wx.NewIdRef(), label)
-            window_item.Check(window.topmost)
-            self.Bind(wx.EVT_MENU, self._on_window_click,
-                      id=window_item.GetId())
-            self.window_mapping[window_item.GetId()] = window
+        # profiling, labelled by whether a profile is running when the menu is shown
+        self._profile_item = menu.Append(wx.ID_ANY, "")
+        self.Bind(wx.EVT_MENU, self._toggle_profiling, self._profile_item)
 
+        # display submenus go between the separators
+        menu.AppendSeparator()
         menu.AppendSeparator()
 
         # exit
-        exit_item = menu.Append(wx.NewIdRef(), "Exit")
+        exit_item = menu.Append(wx.ID_ANY, "Exit")
         self.Bind(wx.EVT_MENU, self._exit, exit_item)
 
         return menu
 
+    def _show_menu(self, event):
+        self._update_menu()
+        self.PopupMenu(self.menu)
+
+    def _update_menu(self):
+        """applies the window changes since the menu was last shown"""
+        self._statistics_item.Enable(metrics.enabled())
+        self._profile_item.SetItemLabel(
+            "Stop profiling" if profiling.running() else f"Profile ({profiling.DEFAULT_SECONDS} s)")
+
+        changes = self.model.take_changes()
+        if len(changes) == 0:
+            return
+        names = self.window_manager.display_names()
+        added = {}  # slot -> hwnd of new entries, labelled below
+        for display_hwnd, entries in changes.items():
+            submenu, item, slots = self._submenus.get(
+                display_hwnd, (None, None, set()))
+            if len(entries) == 0:
+                if item is not None:
+                    self.menu.Destroy(item)
+                    del self._submenus[display_hwnd]
+                continue
+
+            if submenu is None:
+                submenu = wx.Menu()
+                # before the separator and exit item ending the menu
+                position = self.menu.GetMenuItemCount() - 2
+                item = self.menu.Insert(position, wx.ID_ANY, "", submenu)
+            for slot in slots - entries.keys():
+                submenu.Delete(self._slot_ids[slot])
+            for slot in entries.keys() - slots:
+                submenu.AppendCheckItem(self._menu_id(slot), "")
+                added[slot] = entries[slot]
+            self._submenus[display_hwnd] = (submenu, item, set(entries))
+            item.SetItemLabel(
+                f"{names.get(display_hwnd, display_hwnd)} ({len(entries)})")
+
+        self._update_labels(added)
+
+    def _on_menu_open(self, event):
+        menu = event.GetMenu()
+        for display_hwnd, (submenu, _, _) in self._submenus.items():
+            if submenu is menu:
+                self._update_labels(self.model.entries(display_hwnd))
+                return
+
+    def _update_labels(self, entries):
+        """sets the title and topmost check of the {slot: hwnd} entries"""
+        labels = self.window_manager.window_labels(list(entries.values()))
+        for slot, hwnd in entries.items():
+            if hwnd not in labels:
+                continue
+            title, topmost = labels[hwnd]
+            if len(title) >= MAX_LABEL_LENGTH:
+                title = title[:MAX_LABEL_LENGTH - 3] + "..."
+            item = self.menu.FindItemById(self._slot_ids[slot])
+            if item is not None:
+                # & marks mnemonics in menu labels
+                item.SetItemLabel(title.replace("&", "&&"))
+                item.Check(topmost)
+
+    def _menu_id(self, slot):
+        while len(self._slot_ids) <= slot:
+            menu_id = wx.NewIdRef()
+            self.Bind(wx.EVT_MENU, self._on_window_click, id=menu_id)
+            self._slot_ids.append(menu_id)
+            self._slot_of_id[int(menu_id)] = len(self._slot_ids) - 1
+        return self._slot_ids[slot]
+
     def _set_icon(self, path, tooltip):
         icon = wx.Icon()
         icon.LoadFile(path)
@@ -62,11 +150,26 @@ class WimpyTaskBarIcon(wx.adv.TaskBarIcon):
     def _refresh(self, event):
         self.window_manager.refresh()
 
+    def _rebalance(self, event):
+        self.window_manager.rebalance()
+
+    def _show_statistics(self, event):
+        wx.MessageBox(metrics.summary(), f"{self.program_name} statistics")
+
+    def _toggle_profiling(self, event):
+        if profiling.running():
+            profiling.stop()
+        else:
+            profiling.start()
+            self._show_toast_notification(
+                f"Profiling for {profiling.DEFAULT_SECONDS} s, the profile is written to '{profiling.DIRECTORY}'.")
+
     def _exit(self, event):
         self.window_manager.restore_positions()
         wx.CallAfter(self.Destroy)
         wx.Exit()
 
     def _on_window_click(self, event):
-        window = self.window_mapping[event.GetId()]
-        self.window_manager.toggle_window_topmost(window)
+        hwnd = self.model.hwnd(self._slot_of_id.get(event.GetId()))
+        if hwnd is not None:
+            self.window_manager.toggle_window_topmost(hwnd)
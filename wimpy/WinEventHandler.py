@@ -1,69 +1,143 @@
-import ctypes
-import ctypes.wintypes
+import collections
 import logging
 import threading
-import win32con
+
+import wimpy.win32 as win32
+
+from wimpy.WinEventTrace import WinEventRecorder
+
+# posted to the message loop thread to (re)install hooks for the current subscriptions
+WM_UPDATE_SUBSCRIPTIONS = win32.WM_APP + 1
+# posted to the message loop thread to run the calls queued by run_on_thread()
+WM_RUN_CALLS = win32.WM_APP + 2
+
+
+def event_ranges(events):
+    """returns the minimal list of contiguous (event_min, event_max) ranges covering events"""
+    ranges = []
+    for event in sorted(set(events)):
+        if len(ranges) > 0 and ranges[-1][1] == event - 1:
+            ranges[-1] = (ranges[-1][0], event)
+        else:
+            ranges.append((event, event))
+    return ranges
 
 
 class WinEventHandler(object):
     """description of class"""
 
     def __init__(self):
-        pass
+        self.thread = None
+        self.events = frozenset()
+        self.hooks = {}  # (event_min, event_max) -> hook handle
+        self.recorder = None
+        self._calls = collections.deque()
 
-    def start_hook(self, callback, err_callback):
-        """sets up Windows event hook and message loop"""
-        user32 = ctypes.windll.user32
-        ole32 = ctypes.windll.ole32
+        # counters
+        self.received = collections.Counter()
+        self.dispatched = collections.Counter()
 
-        ole32.CoInitialize(0)
-
-        WinEventProcType = ctypes.WINFUNCTYPE(
-            None,
-            ctypes.wintypes.HANDLE,
-            ctypes.wintypes.DWORD,
-            ctypes.wintypes.HWND,
-            ctypes.wintypes.LONG,
-            ctypes.wintypes.LONG,
-            ctypes.wintypes.DWORD,
-            ctypes.wintypes.DWORD)
-        self.WinEventProc = WinEventProcType(callback)
-
-        user32.SetWinEventHook.restype = ctypes.wintypes.HANDLE
-        user32.SetWinEventHook.errcheck = err_callback
+    def start_hook(self, callback, err_callback, events):
+        """sets up Windows event hooks for events and message loop"""
+        self.callback = callback
+        self.err_callback = err_callback
+        self.events = frozenset(events)
 
         self.thread = threading.Thread(
-            target=self._message_loop, args=(user32, ole32))
-        logging.debug(f"Starting message loop thread ({self.thread}).")
+            target=self._message_loop, name="wimpy-events")
+        logging.debug("Starting message loop thread (%s).", self.thread.name)
         self.thread.start()
 
     def stop_hook(self):
         """ends Windows event hook thread"""
         if self.thread is not None:
             logging.debug("Stopping message loop")
-            ctypes.windll.user32.PostThreadMessageW(
-                self.thread.ident, win32con.WM_QUIT, 0, 0)
+            win32.PostThreadMessage(self.thread.ident, win32.WM_QUIT)
             self.thread = None
 
-    def _message_loop(self, user32, ole32):
+    def subscribe(self, event):
+        """adds event to the hooked events, installing a hook if needed"""
+        if event not in self.events:
+            self.events = self.events | {event}
+            self._post_update()
+
+    def unsubscribe(self, event):
+        """removes event from the hooked events, removing its hook if no longer needed"""
+        if event in self.events:
+            self.events = self.events - {event}
+            self._post_update()
+
+    def run_on_thread(self, func):
+        """runs func on the message loop thread, between two events"""
+        self._calls.append(func)
+        if self.thread is not None:
+            win32.PostThreadMessage(self.thread.ident, WM_RUN_CALLS)
+
+    def start_recording(self, path):
+        """records all received events and the state of their windows to a trace file"""
+        recorder = WinEventRecorder(path)
+        recorder.snapshot_desktop()
+        logging.info("Recording events to '%s'.", path)
+        self.recorder = recorder
+
+    def stop_recording(self):
+        recorder = self.recorder
+        if recorder is not None:
+            self.recorder = None
+            recorder.close()
+
+    def _post_update(self):
+        if self.thread is not None:
+            win32.PostThreadMessage(
+                self.thread.ident, WM_UPDATE_SUBSCRIPTIONS)
+
+    def _on_event(self, hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
+        self.received[event] += 1
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_event(event, hwnd, idObject,
+                                  idChild, dwEventThread, dwmsEventTime)
+        # a hook may still deliver events that were unsubscribed since it was installed
+        if event in self.events:
+            self.dispatched[event] += 1
+            self.callback(hWinEventHook, event, hwnd, idObject,
+                          idChild, dwEventThread, dwmsEventTime)
+
+    def _update_hooks(self):
+        """installs one hook per contiguous range of subscribed events"""
+        ranges = event_ranges(self.events)
+        for event_range in list(self.hooks.keys()):
+            if event_range not in ranges:
+                win32.UnhookWinEvent(self.hooks.pop(event_range))
+        for event_min, event_max in ranges:
+            if (event_min, event_max) in self.hooks:
+                continue
+            hook = win32.SetWinEventHook(
+                event_min, event_max, self._on_event, self.err_callback)
+            if not hook:
+                raise RuntimeError(
+                    f"Failed to set hook for events {event_min:#06x}-{event_max:#06x}!")
+            self.hooks[(event_min, event_max)] = hook
+        logging.debug("Hooked %d event range(s): %s", len(self.hooks), ranges)
+
+    def _unhook_all(self):
+        for hook in self.hooks.values():
+            win32.UnhookWinEvent(hook)
+        self.hooks.clear()
+
+    def _on_thread_message(self, message):
+        if message == WM_UPDATE_SUBSCRIPTIONS:
+            self._update_hooks()
+        elif message == WM_RUN_CALLS:
+            while len(self._calls) > 0:
+                func = self._calls.popleft()
+                try:
+                    func()
+                except:
+                    logging.error("Error in call on the message loop thread:",
+                                  exc_info=True)
+
+    def _message_loop(self):
         """message loop to dispatch events"""
-        hook = user32.SetWinEventHook(
-            win32con.EVENT_MIN,
-            win32con.EVENT_MAX,
-            0,
-            self.WinEventProc,
-            0,
-            0,
-            win32con.WINEVENT_OUTOFCONTEXT | win32con.WINEVENT_SKIPOWNPROCESS)
-        if hook == 0:
-            raise RuntimeError("Failed to set hook!")
-
-        # message loop
-        message = ctypes.wintypes.MSG()
-        while user32.GetMessageW(ctypes.byref(message), 0, 0, 0) != 0:
-            user32.TranslateMessageW(message)
-            user32.DispatchMessageW(message)
-
-        # cleanup
-        user32.UnhookWinEvent(hook)
-        ole32.CoUninitialize()
+        win32.RunMessageLoop(self._update_hooks,
+                             self._on_thread_message, self._unhook_all)
@@ -0,0 +1,111 @@
+import logging
+import struct
+import threading
+import time
+
+import wimpy.win32 as win32
+
+MAGIC = b"WIMPYTRC"
+VERSION = 1
+HEADER = struct.Struct("<8sI")
+
+# every record has the same size:
+# kind, microseconds since recording start, hwnd and six 32 bit fields
+RECORD = struct.Struct("<B3xqQiiiiII")
+
+KIND_EVENT = 0  # event, idObject, idChild, 0, dwEventThread, dwmsEventTime
+KIND_WINDOW = 1  # window snapshot: l, t, r, b, style, exstyle
+KIND_MONITOR = 2  # monitor rect: l, t, r, b, 0, 0
+KIND_WORK_AREA = 3  # monitor work area: l, t, r, b, 0, 0
+
+_BUFFER_SIZE = 64 * 1024
+
+# events after which the window's rect or styles may differ, only these are followed
+# by a window snapshot to keep the native calls on the hook thread down
+SNAPSHOT_EVENTS = frozenset([
+    win32.EVENT_OBJECT_CREATE,
+    win32.EVENT_OBJECT_SHOW,
+    win32.EVENT_OBJECT_HIDE,
+    win32.EVENT_OBJECT_LOCATIONCHANGE,
+    win32.EVENT_SYSTEM_MOVESIZEEND,
+    win32.EVENT_SYSTEM_MINIMIZESTART,
+    win32.EVENT_SYSTEM_MINIMIZEEND
+])
+
+
+class WinEventRecorder(object):
+    """Appends WinEvents and window state snapshots to a binary trace file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._start = time.perf_counter()
+
+    def close(self):
+        with self._lock:
+            # the hook thread may still be recording an event
+            self._closed = True
+            self._flush()
+            self._file.close()
+        logging.info("Recorded %d record(s) to '%s'.",
+                     self.records, self.path)
+
+    def snapshot_desktop(self):
+        """records all monitors and top-level windows"""
+        for hmonitor in win32.EnumDisplayMonitors():
+            info = win32.GetMonitorInfo(hmonitor)
+            self._append(KIND_MONITOR, hmonitor, *info["Monitor"], 0, 0)
+            self._append(KIND_WORK_AREA, hmonitor, *info["Work"], 0, 0)
+        for hwnd in win32.EnumWindows():
+            self.snapshot_window(hwnd)
+
+    def snapshot_window(self, hwnd):
+        try:
+            l, t, r, b = win32.GetWindowRect(hwnd)
+            style = win32.GetWindowStyles(hwnd) & 0xFFFFFFFF
+            exstyle = win32.GetWindowExStyles(hwnd) & 0xFFFFFFFF
+        except:
+            # destroyed since the event was raised
+            return
+        self._append(KIND_WINDOW, hwnd, l, t, r, b, style, exstyle)
+
+    def record_event(self, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
+        self._append(KIND_EVENT, hwnd or 0, event, idObject,
+                     idChild, 0, dwEventThread, dwmsEventTime)
+        if hwnd and idObject == win32.OBJID_WINDOW and event in SNAPSHOT_EVENTS:
+            self.snapshot_window(hwnd)
+
+    def _append(self, kind, hwnd, a, b, c, d, e, f):
+        timestamp = int((time.perf_counter() - self._start) * 1000000)
+        record = RECORD.pack(kind, timestamp, int(hwnd), a, b, c, d, e, f)
+        with self._lock:
+            if self._closed:
+                return
+            self._buffer += record
+            self.records += 1
+            if len(self._buffer) >= _BUFFER_SIZE:
+                self._flush()
+
+    def _flush(self):
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+
+def read_trace(path):
+    """yields (kind, timestamp, hwnd, fields) for every record in a trace file"""
+    with open(path, "rb") as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a version {VERSION} wimpy trace")
+
+        while True:
+            data = f.read(RECORD.size)
+            if len(data) < RECORD.size:
+                return
+            kind, timestamp, hwnd, *fields = RECORD.unpack(data)
+            yield kind, timestamp, hwnd, fields
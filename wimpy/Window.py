@@ -1,7 +1,6 @@
 import logging
-import win32con
-import win32gui
 
+import wimpy.logs as logs
 import wimpy.win32 as win32
 
 
@@ -10,20 +9,86 @@ class Window(object):
 
     def __init__(self, hwnd):
         self.hwnd = hwnd
-        self._cache_properties()
+        self._display_size = None
+        self._title = None
+        self._pretty_title = None
+        self._classname = None
+        self._topmost = None
         self.initial_size = self.display_size
 
+        # learned (width, height) limits, see WindowConstraints
+        self.min_size = None
+        self.max_size = None
+        # last rect a strategy asked for and when, and the last (requested, actual) pair the window refused
+        self.requested_size = None
+        self.requested_at = 0.0
+        self.refused = None
+
     def refresh(self):
-        self._cache_properties()
+        self.invalidate()
+
+    def invalidate(self, rect=True, title=True, style=True):
+        """marks properties stale, they are re-read on next access"""
+        if rect:
+            self._display_size = None
+        if title:
+            self._title = None
+            self._pretty_title = None
+        if style:
+            self._topmost = None
+
+    def is_valid(self):
+        return win32.IsWindow(self.hwnd)
+
+    @property
+    def display_size(self):
+        if self._display_size is None:
+            self._display_size = win32.GetWindowRect(self.hwnd)
+        return self._display_size
+
+    @display_size.setter
+    def display_size(self, value):
+        self._display_size = value
+
+    @property
+    def title(self):
+        if self._title is None:
+            self._title = win32.GetWindowText(self.hwnd)
+        return self._title
+
+    @property
+    def pretty_title(self):
+        if self._pretty_title is None:
+            self._pretty_title = self._get_pretty_title()
+        return self._pretty_title
+
+    @property
+    def classname(self):
+        # class names never change for the lifetime of a window
+        if self._classname is None:
+            self._classname = win32.GetWindowClassName(self.hwnd)
+        return self._classname
+
+    @property
+    def topmost(self):
+        if self._topmost is None:
+            self._topmost = self._get_topmost()
+        return self._topmost
+
+    @topmost.setter
+    def topmost(self, value):
+        self._topmost = value
 
     def restore_initial_position(self):
         return self.move_to(self.initial_size)
 
     def move_to(self, window_size):
-        logging.debug(
-            f"move_to: {self.pretty_title} [{int(self.hwnd)}]\t{self.display_size} -> {window_size}")
+        if logs.enabled_for(logging.DEBUG):
+            logging.debug("move_to: %s [%d]\t%s -> %s", self.pretty_title,
+                          int(self.hwnd), self.display_size, window_size)
         l, t, r, b = window_size
-        win32.MoveWindow(self.hwnd, l, t, r - l, b - t, True)
+        win32.SetWindowPos(self.hwnd, 0, l, t, r - l, b - t,
+                           win32.SWP_NOZORDER | win32.SWP_NOACTIVATE | win32.SWP_ASYNCWINDOWPOS)
         self.display_size = window_size
 
     def set_topmost(self, topmost):
@@ -32,27 +97,20 @@ class Window(object):
 
         l, t, r, b = self.display_size
         win32.SetWindowPos(
-            self.hwnd, win32con.HWND_TOPMOST if topmost else win32con.HWND_NOTOPMOST, l, t, r - l, b - t, 0)
+            self.hwnd, win32.HWND_TOPMOST if topmost else win32.HWND_NOTOPMOST, l, t, r - l, b - t, win32.SWP_ASYNCWINDOWPOS)
         self.topmost = topmost
         return True
 
-    def _pretty_title(self):
+    def _get_pretty_title(self):
         if " - " in self.title:
             parts = self.title.split(" - ")
             return " - ".join(parts[::-1])
         return self.title
 
-    def _cache_properties(self):
-        self.display_size = win32.GetWindowRect(self.hwnd)
-        self.title = win32.GetWindowText(self.hwnd)
-        self.pretty_title = self._pretty_title()
-        self.classname = win32.GetWindowClassName(self.hwnd)
-        self.topmost = self._get_topmost()
-
     def _get_topmost(self):
         try:
             exstyle = win32.GetWindowExStyles(self.hwnd)
-            return exstyle & win32con.WS_EX_TOPMOST
+            return bool(exstyle & win32.WS_EX_TOPMOST)
         except:
             return False
 
@@ -0,0 +1,64 @@
+import logging
+
+# size differences up to this many pixels are taken for snapping to a grid (e.g.
+# terminal character cells), not for a minimum or maximum size
+SNAP_TOLERANCE = 16
+
+
+class WindowConstraints(object):
+    """Minimum and maximum window sizes learned from moves windows refused
+
+    Constraints are kept per window and per class name; windows of a class start
+    with the constraints learned from its other windows. They are stored on the
+    Windows as min_size and max_size, (width, height) tuples or None."""
+
+    def __init__(self):
+        self._classes = {}  # class name -> [min_size, max_size]
+
+        # counters
+        self.learned = 0
+
+    def apply(self, window):
+        """gives a newly tracked window the constraints learned for its class"""
+        constraints = self._classes.get(window.classname)
+        if constraints is not None:
+            window.min_size, window.max_size = constraints
+
+    def observe(self, window, requested, actual):
+        """learns from window taking the actual rect instead of the requested one, returns True if its constraints changed"""
+        min_size = list(window.min_size or (0, 0))
+        max_size = list(window.max_size or (None, None))
+        for axis in (0, 1):
+            requested_length = requested[axis + 2] - requested[axis]
+            actual_length = actual[axis + 2] - actual[axis]
+            if actual_length > requested_length + SNAP_TOLERANCE:
+                min_size[axis] = max(min_size[axis], actual_length)
+            elif actual_length < requested_length - SNAP_TOLERANCE:
+                current = max_size[axis]
+                max_size[axis] = actual_length if current is None else min(
+                    current, actual_length)
+
+        min_size = tuple(min_size) if min_size != [0, 0] else None
+        max_size = tuple(m if m is not None else 1 << 16 for m in max_size) \
+            if max_size != [None, None] else None
+        if (min_size, max_size) == (window.min_size, window.max_size):
+            return False
+
+        window.min_size = min_size
+        window.max_size = max_size
+        self._learn_class(window.classname, min_size, max_size)
+        self.learned += 1
+        logging.info("[%s] Learned size constraints of '%s': min %s, max %s.",
+                     window.hwnd, window.classname, min_size, max_size)
+        return True
+
+    def _learn_class(self, classname, min_size, max_size):
+        constraints = self._classes.setdefault(classname, [None, None])
+        if min_size is not None:
+            current = constraints[0] or (0, 0)
+            constraints[0] = (max(current[0], min_size[0]),
+                              max(current[1], min_size[1]))
+        if max_size is not None:
+            current = constraints[1] or max_size
+            constraints[1] = (min(current[0], max_size[0]),
+                              min(current[1], max_size[1]))
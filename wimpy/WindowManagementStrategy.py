@@ -1,3 +1,15 @@
+import logging
+import time
+
+import wimpy.config as config
+import wimpy.metrics as metrics
+import wimpy.win32 as win32
+
+# asynchronous positioning only posts the request to the window's thread, a hung application cannot block us
+ASYNC_POSITION_FLAGS = (win32.SWP_NOZORDER | win32.SWP_NOACTIVATE |
+                        win32.SWP_NOOWNERZORDER | win32.SWP_ASYNCWINDOWPOS)
+
+
 def area_from_size(size):
     l, t, r, b = size
     return (r - l) * (b - t)
@@ -22,4 +34,84 @@ class WindowManagementStrategy(object):
     """stuff"""
 
     def apply(self, display, windows, active_hwnd):
+        return self.commit(self.plan(display, windows, active_hwnd))
+
+    def plan(self, display, windows, active_hwnd):
+        """returns the [(window, window_size)] placements for windows on display"""
+        return []
+
+    def commit(self, placements):
+        """moves every window whose position changed, returns the [(window, window_size)] moved
+
+        Moves are posted asynchronously, or made in one deferred transaction if AsyncPositioning is off.
+        A rect the window refused before is not requested again while it keeps the rect it took instead."""
+        moves = [(window, window_size) for window, window_size in placements
+                 if window.display_size != window_size and window.refused != (window_size, window.display_size)]
+        if len(moves) == 0:
+            return moves
+
+        now = time.monotonic()
+        for window, window_size in moves:
+            window.requested_size = window_size
+            window.requested_at = now
+
+        if not config.async_positioning():
+            for window, window_size in moves:
+                logging.debug("[%s] move_to: %s", window.hwnd, window_size)
+            win32.DeferWindowPositions(
+                [(window.hwnd, window_size) for window, window_size in moves])
+            for window, window_size in moves:
+                window.display_size = window_size
+            return moves
+
+        return [(window, window_size) for window, window_size in moves
+                if self._post_position(window, window_size)]
+
+    def _post_position(self, window, window_size):
+        """returns False if the move could not be posted"""
+        l, t, r, b = window_size
+        start = time.perf_counter()
+        try:
+            win32.SetWindowPos(window.hwnd, 0, l, t, r - l,
+                               b - t, ASYNC_POSITION_FLAGS)
+        except:
+            logging.error("[%s] Failed to position window:",
+                          window.hwnd, exc_info=True)
+            return False
+        elapsed = time.perf_counter() - start
+        window.display_size = window_size
+
+        metrics.observe("window_placement_seconds", elapsed)
+        if elapsed * 1000 >= config.slow_placement():
+            logging.warning("[%s] Positioning '%s' took %.1f ms.",
+                            window.hwnd, window.classname, elapsed * 1000)
+        else:
+            logging.debug("[%s] move_to: %s (%.2f ms)",
+                          window.hwnd, window_size, elapsed * 1000)
+        return True
+
+    def rebalance(self, display=None):
+        pass
+
+    def constraints_changed(self, display, window):
+        """called when the learned min_size or max_size of window on display changed"""
+        pass
+
+    def window_dropped(self, display, window):
+        """called when the user stopped moving window on display, before display is laid out"""
+        pass
+
+    def config_changed(self, previous, current):
+        """called on the worker after the config was reloaded, before affected displays are laid out"""
+        pass
+
+    def save_state(self):
+        """returns the layout state to keep across restarts, made of JSON types"""
+        return None
+
+    def restore_state(self, state, displays, windows):
+        """restores save_state() output from the previous run
+
+        displays maps display hwnds to the Displays still present, windows maps hwnds
+        to the Windows still present; state referring to anything else is dropped."""
         pass
@@ -1,183 +1,684 @@
 import collections
-import ctypes
 import logging
-import win32con
+import time
 
 import wimpy.config as config
+import wimpy.logs as logs
+import wimpy.metrics as metrics
 import wimpy.win32 as win32
 
 from wimpy.Display import Display
-from wimpy.Window import Window
+from wimpy.LayoutWorker import *
+from wimpy.MoveEchoes import MoveEchoes
+from wimpy.RelayoutScheduler import RelayoutScheduler
+from wimpy.WindowConstraints import WindowConstraints
+from wimpy.WindowQuarantine import WindowQuarantine
+
+
+# seconds after a move in which a different rect counts as the window refusing it
+MOVE_RESPONSE_TIME = 0.5
+# seconds after a move in which location changes of the window are taken for its echo
+ECHO_TIMEOUT = 0.2
 
 
 class WindowManager(object):
     """description of class"""
 
-    def __init__(self, tracker, strategy):
-        logging.info(f"Using tracker '{type(tracker).__name__}'.")
+    def __init__(self, tracker, strategy, session=None):
+        """session is the session_state() saved by the previous run, or None"""
+        logging.info("Using tracker '%s'.", type(tracker).__name__)
         self.window_tracker = tracker
-        self.window_tracker.refresh()
 
-        logging.info(f"Using strategy '{type(strategy).__name__}'.")
+        logging.info("Using strategy '%s'.", type(strategy).__name__)
         self.strategy = strategy
 
         self.MESSAGE_MAP = {
-            win32con.EVENT_OBJECT_CREATE: self._on_object_create,
-            win32con.EVENT_OBJECT_DESTROY: self._on_object_destroy,
-            win32con.EVENT_OBJECT_HIDE: self._on_object_destroy,
-            win32con.EVENT_OBJECT_LOCATIONCHANGE: self._on_location_change,
-            win32con.EVENT_OBJECT_SHOW: self._on_object_create,
-            win32con.EVENT_SYSTEM_MOVESIZESTART: self._on_movesize_start,
-            win32con.EVENT_SYSTEM_MOVESIZEEND: self._on_movesize_end,
-            win32con.EVENT_SYSTEM_MINIMIZESTART: self._on_minimize_start,
-            win32con.EVENT_SYSTEM_MINIMIZEEND: self._on_minimize_end
+            win32.EVENT_OBJECT_CREATE: self._on_object_create,
+            win32.EVENT_OBJECT_DESTROY: self._on_object_destroy,
+            win32.EVENT_OBJECT_HIDE: self._on_object_destroy,
+            win32.EVENT_OBJECT_LOCATIONCHANGE: self._on_location_change,
+            win32.EVENT_OBJECT_NAMECHANGE: self._on_name_change,
+            win32.EVENT_OBJECT_SHOW: self._on_object_create,
+            win32.EVENT_SYSTEM_MOVESIZESTART: self._on_movesize_start,
+            win32.EVENT_SYSTEM_MOVESIZEEND: self._on_movesize_end,
+            win32.EVENT_SYSTEM_MINIMIZESTART: self._on_minimize_start,
+            win32.EVENT_SYSTEM_MINIMIZEEND: self._on_minimize_end
         }
-        self.displays = []
-        self.windows = []  # TODO: move this inside WindowTracker
+        self.displays = {}  # display hwnd -> Display
         self.movesize_window_handle = None
-
-        self._update_tracked_windows(0, 0)
-        self.refresh()
+        self._event_name = None  # name of the event being handled, the reason of scheduled relayouts
+
+        # all state below is owned by the worker thread, other threads submit work to it
+        self.worker = LayoutWorker()
+        self.scheduler = RelayoutScheduler(
+            self._on_relayout_due, config.relayout_delay(), config.relayout_max_latency(),
+            priority=self._relayout_priority)
+        self.quarantine = WindowQuarantine(config.hung_probe_timeout())
+        self._probe_scheduled = False
+        self.constraints = WindowConstraints()
+        self.echoes = MoveEchoes(ECHO_TIMEOUT)
+        self._echo_check_scheduled = False
+        self._window_relayouts = {}  # hwnd -> deque of monotonic times of relayouts it caused
+        self._capped_windows = set()
+
+        # one enumeration, then only windows differing from the saved session are moved
+        start = time.perf_counter()
+        self._reconcile(full=True)
+        enumerated = time.perf_counter()
+        restored = self._restore_session(session) if session is not None else 0
+        self._apply_strategy("startup")
+        logging.info("Startup: %d window(s) enumerated in %.1f ms, %d restored from the session, "
+                     "laid out in %.1f ms.", len(self.window_tracker.registry),
+                     (enumerated - start) * 1000, restored, (time.perf_counter() - enumerated) * 1000)
+        self.worker.start()
+        self.scheduler.start(self.worker)
+
+        config.subscribe(self._on_config_reloaded)
+        self._schedule_config_poll()
+        self._schedule_sweep()
+
+    def stop(self):
+        self.scheduler.stop()
+        self.worker.stop()
 
     def on_event(self, hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
+        """called on the hook thread, only queues the event for the worker"""
         if hwnd is None:
             return
-        if idObject != win32con.OBJID_WINDOW:
+        if idObject != win32.OBJID_WINDOW:
             return
 
-        func = self.MESSAGE_MAP.get(event)
-        if func is not None:
-            func(hwnd, dwmsEventTime)
+        if event in self.MESSAGE_MAP:
+            if metrics.enabled():
+                name = win32.EVENT_NAMES.get(event)
+                metrics.increment("events_total", name)
+                # both are 32 bit millisecond tick counts
+                queued = (win32.GetTickCount() - dwmsEventTime) & 0xFFFFFFFF
+                metrics.observe("event_queueing_seconds", queued / 1000, name)
+            self.worker.submit(PRIORITY_EVENT, self._handle_event,
+                               event, hwnd, dwmsEventTime)
 
     def on_error(self, result, func, args):
-        pass
+        return result
+
+    def session_state(self):
+        """returns the state to pass to the next run's WindowManager, made of JSON types"""
+        return self.worker.call(self._session_state)
+
+    def flush_echoes(self):
+        """checks all windows whose move echoes were dropped now, instead of once they expire"""
+        self.worker.call(self._check_echoes, True)
+
+    def windows(self):
+        """returns a snapshot of the tracked windows"""
+        return self.worker.call(lambda: list(self.window_tracker.windows()))
+
+    def subscribe_windows(self, listener):
+        """calls listener(hwnd, old display hwnd, new display hwnd) on the worker when a window's display changes
+
+        The listener is called for the windows already tracked first."""
+        self.worker.call(self._subscribe_windows, listener)
+
+    def display_names(self):
+        """returns {display hwnd: name} in display order"""
+        return self.worker.call(lambda: {hwnd: str(d) for hwnd, d in self.displays.items()})
+
+    def window_labels(self, hwnds):
+        """returns {hwnd: (title, topmost)} of those of hwnds still tracked"""
+        return self.worker.call(self._window_labels, hwnds)
 
     def restore_positions(self):
-        logging.debug("Restoring window positions")
-        for w in self.windows:
-            w.restore_initial_position()
+        self.worker.call(self._restore_positions)
 
-    def toggle_window_topmost(self, window):
-        window.set_topmost(not window.topmost)
-        self._apply_strategy_to_display_by_window(window.hwnd)
+    def toggle_window_topmost(self, hwnd):
+        self.worker.submit(PRIORITY_EVENT, self._toggle_window_topmost, hwnd)
+
+    def rebalance(self):
+        """rebuilds the layout of every display from scratch"""
+        self.worker.submit(PRIORITY_EVENT, self._rebalance)
 
     def refresh(self):
-        self._update_tracked_windows(0, 0)
-        self.displays = [Display(hwnd) for hwnd in win32.EnumDisplayMonitors()]
-        self.windows = [Window(w)
-                        for w in self.window_tracker.tracked_window_handles]
-        logging.debug(
-            f"Refresh found {len(self.displays)} Display(s), {len(self.windows)} Window(s).")
+        self.worker.submit(PRIORITY_HOUSEKEEPING, self._refresh)
+
+    def sweep(self):
+        """catches up on changes the hook missed, as the periodic sweep does"""
+        self.worker.submit(PRIORITY_HOUSEKEEPING, self._sweep)
+
+    def _handle_event(self, event, hwnd, dwmsEventTime):
+        # echoes of our own moves are dropped before any native call
+        if event == win32.EVENT_OBJECT_LOCATIONCHANGE and self.echoes.is_echo(hwnd):
+            metrics.increment("echo_events_suppressed_total")
+            return
+
+        self._event_name = win32.EVENT_NAMES.get(event)
+        try:
+            self._invalidate_tracking_decision(event, hwnd)
+            self.MESSAGE_MAP[event](hwnd, dwmsEventTime)
+        except:
+            # events are handled after they were queued, the window may be gone by now
+            if win32.IsWindow(hwnd):
+                raise
+            logging.debug("[%s] Window was destroyed before its %s event was handled.",
+                          hwnd, self._event_name)
+            self.window_tracker.forget_handle(hwnd)
+            if hwnd in self.window_tracker.tracked_window_handles:
+                self._stop_tracking_window(hwnd)
+        finally:
+            self._event_name = None
+
+    def _restore_positions(self):
+        logging.debug("Restoring window positions")
+        for w in self.window_tracker.windows():
+            w.restore_initial_position()
+            self.echoes.expect(w.hwnd, w.initial_size)
+        self._schedule_echo_check()
 
-        self._apply_strategy()
+    def _toggle_window_topmost(self, hwnd):
+        window = self._get_tracked_window_by_handle(hwnd)
+        if window is None:
+            return
+        window.set_topmost(not window.topmost)
+        self._schedule_display_by_window(hwnd)
+
+    def _subscribe_windows(self, listener):
+        registry = self.window_tracker.registry
+        for hwnd in registry.handles():
+            display_hwnd = registry.get_display(hwnd)
+            if display_hwnd is not None:
+                listener(hwnd, None, display_hwnd)
+        registry.subscribe(listener)
+
+    def _window_labels(self, hwnds):
+        labels = {}
+        for hwnd in hwnds:
+            window = self._get_tracked_window_by_handle(hwnd)
+            if window is not None:
+                labels[hwnd] = (str(window), window.topmost)
+        return labels
+
+    def _rebalance(self):
+        self.strategy.rebalance()
+        self._apply_strategy("rebalance")
+
+    def _refresh(self):
+        """re-reads every window and display, laying out only the displays that changed"""
+        changed = self._reconcile(full=True)
+        for display in changed:
+            self.scheduler.cancel(display)
+            self._apply_strategy_to_display(display, "refresh")
+
+    def _schedule_sweep(self):
+        interval = config.sweep_interval()
+        if interval > 0:
+            self.worker.call_later(interval / 1000, self.worker.submit,
+                                   PRIORITY_HOUSEKEEPING, self._sweep, True)
+        else:
+            # sweeps may be turned on by reloading the config
+            self.worker.call_later(config.POLL_INTERVAL,
+                                   self._schedule_sweep)
+
+    def _sweep(self, reschedule=False):
+        changed = self._reconcile()
+        if len(changed) > 0:
+            metrics.increment("sweep_changed_displays_total",
+                              amount=len(changed))
+            logging.debug("Sweep found changes on %d display(s).", len(changed))
+        for display in changed:
+            self.scheduler.mark_dirty(display, reason="sweep")
+        if reschedule:
+            self._schedule_sweep()
+
+    def _reconcile(self, full=False):
+        """brings displays and windows in sync with the desktop in one enumeration, returns the displays that changed
+
+        Displays and Windows still present are kept. Only their rects are re-read,
+        a full reconcile also re-evaluates every tracking decision and window property."""
+        changed = self._reconcile_displays()
+        if full:
+            self.window_tracker.invalidate_all()
+        kept = set(self.window_tracker.tracked_window_handles)
+        changed |= self._update_tracked_windows()
+
+        for window in self.window_tracker.windows():
+            prev_display = self._get_display_by_window_handle(window.hwnd)
+            # windows added above were just read, windows being moved are left to the movesize and echo handling
+            if window.hwnd in kept and window.hwnd != self.movesize_window_handle and \
+                    window.hwnd not in self.echoes:
+                prev_state = (window.display_size, window.topmost)
+                window.invalidate(title=full)
+                if prev_state != (window.display_size, window.topmost):
+                    changed.add(prev_display)
+            self._update_window_display(window.hwnd)
+            display = self._get_display_by_window_handle(window.hwnd)
+            if display != prev_display:
+                changed.add(prev_display)
+                changed.add(display)
+        changed.discard(None)
+
+        logging.debug("Reconciled %d Display(s), %d Window(s), %d display(s) changed. "
+                      "Tracking decisions: %d hit(s), %d miss(es).",
+                      len(self.displays), len(self.window_tracker.registry), len(changed),
+                      self.window_tracker.cache_hits, self.window_tracker.cache_misses)
+        return changed
+
+    def _reconcile_displays(self):
+        """keeps the Displays still present, returns those added or whose rects changed"""
+        displays = {}
+        changed = set()
+        for hwnd in win32.EnumDisplayMonitors():
+            display = self.displays.get(int(hwnd))
+            if display is None:
+                display = Display(hwnd)
+                changed.add(display)
+            elif display.refresh():
+                changed.add(display)
+            displays[int(hwnd)] = display
+
+        for display_hwnd, display in self.displays.items():
+            if display_hwnd not in displays:
+                logging.info("Display [%s] %s was removed.",
+                             int(display_hwnd), display.monitor_size)
+                self.scheduler.cancel(display)
+                self.strategy.rebalance(display)
+        # windows of removed displays and pinned windows are reassigned by _reconcile()
+        self.displays = displays
+        return changed
+
+    def _session_state(self):
+        windows = []
+        for window in self.window_tracker.windows():
+            try:
+                pid = win32.GetWindowProcessId(window.hwnd)
+            except:
+                continue
+            windows.append({
+                "hwnd": int(window.hwnd),
+                "classname": window.classname,
+                "pid": pid,
+                "initial_size": list(window.initial_size),
+                "min_size": window.min_size and list(window.min_size),
+                "max_size": window.max_size and list(window.max_size)
+            })
+        displays = [{"hwnd": int(d.hwnd), "monitor": list(d.monitor_size)}
+                    for d in self.displays.values()]
+        return {"windows": windows, "displays": displays, "layout": self.strategy.save_state()}
+
+    def _restore_session(self, session):
+        """takes initial positions and layouts of windows and displays still present from session
+
+        A handle only counts as the same window if its class and process match too.
+        Returns the number of windows restored."""
+        try:
+            saved = {w["hwnd"]: w for w in session["windows"]}
+            windows = {}
+            for window in self.window_tracker.windows():
+                entry = saved.get(int(window.hwnd))
+                if entry is None or entry["classname"] != window.classname or \
+                        entry["pid"] != win32.GetWindowProcessId(window.hwnd):
+                    continue
+                window.initial_size = tuple(entry["initial_size"])
+                for key in ("min_size", "max_size"):
+                    if entry.get(key) is not None:
+                        setattr(window, key, tuple(entry[key]))
+                windows[int(window.hwnd)] = window
+
+            monitors = {d["hwnd"]: tuple(d["monitor"])
+                        for d in session["displays"]}
+            displays = {hwnd: d for hwnd, d in self.displays.items()
+                        if monitors.get(hwnd) == tuple(d.monitor_size)}
+            if session.get("layout") is not None:
+                self.strategy.restore_state(
+                    session["layout"], displays, windows)
+        except (KeyError, TypeError, ValueError):
+            logging.warning("Ignoring malformed session:", exc_info=True)
+            self.strategy.rebalance()
+            return 0
+        return len(windows)
 
     def _start_tracking_window(self, hwnd):
-        self.window_tracker.add_handle(hwnd)
-        self.windows.append(Window(hwnd))
-        self._apply_strategy_to_display_by_window(hwnd)
+        if self.window_tracker.add_handle(hwnd):
+            self.constraints.apply(self.window_tracker.get_window(hwnd))
+            self._update_window_display(hwnd)
+        self._schedule_display_by_window(hwnd)
 
     def _stop_tracking_window(self, hwnd):
         display = self._get_display_by_window_handle(hwnd)
-        self.window_tracker.remove_handle(hwnd)
-        self.windows = list(filter(lambda w: w.hwnd != hwnd, self.windows))
+        self._remove_window(hwnd)
 
         if display is not None:
-            self._apply_strategy_to_display(display)
-
-    def _apply_strategy(self):
-        for display in self.displays:
-            self._apply_strategy_to_display(display)
+            self._mark_display_dirty(display)
 
-    def _apply_strategy_to_display(self, display):
-        to_remove = []
+    def _remove_window(self, hwnd):
+        self.window_tracker.remove_handle(hwnd)
+        self.quarantine.release(hwnd)
+        self._window_relayouts.pop(hwnd, None)
+        self._capped_windows.discard(hwnd)
+        self.echoes.discard(hwnd)
+
+    def _mark_display_dirty(self, display):
+        self.scheduler.mark_dirty(display, reason=self._event_name)
+
+    def _on_relayout_due(self, display, event_count, reason):
+        # displays are recreated on refresh, use the current instance
+        current = self.displays.get(int(display.hwnd))
+        if current is not None:
+            self._apply_strategy_to_display(current, reason)
+
+    def _relayout_priority(self, display):
+        """the display showing the foreground window is laid out first"""
+        foreground = win32.GetForegroundWindow()
+        if not foreground:
+            return PRIORITY_BACKGROUND
+        display_hwnd = self.window_tracker.registry.get_display(foreground)
+        if display_hwnd is None:
+            display_hwnd = int(win32.MonitorFromWindow(foreground))
+        return PRIORITY_FOREGROUND if display_hwnd == int(display.hwnd) else PRIORITY_BACKGROUND
+
+    def _apply_strategy(self, reason=None):
+        for display in self.displays.values():
+            self._apply_strategy_to_display(display, reason)
+
+    def _apply_strategy_to_display(self, display, reason=None):
+        # get windows in display, dropping windows destroyed without an event
+        display_windows = []
+        for w in self.window_tracker.registry.windows_on_display(int(display.hwnd)):
+            if w.is_valid():
+                display_windows.append(w)
+            else:
+                logging.warning("[%s] removing stale window", w.hwnd)
+                self.window_tracker.remove_handle(w.hwnd)
 
-        for w in self.windows:
+        # apply strategy
+        still_windows = [w for w in display_windows if w.hwnd != self.movesize_window_handle
+                         and not self.window_tracker.is_floating(w.hwnd)
+                         and not self._is_quarantined(w.hwnd)]
+        logging.debug("Applying strategy to %d window(s) in display [%s] %s.",
+                      len(still_windows), int(display.hwnd), display.display_size)
+        with metrics.timer("strategy_compute_seconds", reason):
+            placements = self.strategy.plan(
+                display, still_windows, win32.GetForegroundWindow())
+        with metrics.timer("placement_commit_seconds", reason):
+            moves = self.strategy.commit(placements)
+        for window, window_size in moves:
+            self.echoes.expect(window.hwnd, window_size)
+        if len(moves) > 0:
+            self._schedule_echo_check()
+
+    def _schedule_echo_check(self):
+        if self._echo_check_scheduled:
+            return
+        self._echo_check_scheduled = True
+        self.worker.call_later(ECHO_TIMEOUT, self.worker.submit,
+                               PRIORITY_HOUSEKEEPING, self._check_echoes)
+
+    def _check_echoes(self, force=False):
+        """checks that windows whose echo was dropped took the requested rect, handling the change if not"""
+        self._echo_check_scheduled = False
+        for hwnd, rect in self.echoes.pop_expired(force):
+            if hwnd not in self.window_tracker.tracked_window_handles:
+                continue
             try:
-                w.refresh()
+                actual = win32.GetWindowRect(hwnd)
             except:
-                to_remove.append(w)
-        for w in to_remove:
-            logging.warn(f"removing stale window: {w.pretty_title}")
-            self.windows.remove(w)
-
-        # get windows in display
-        display_windows = [
-            w for w in self.windows if display.contains_window(w.hwnd)]
+                continue
+            if tuple(actual) != rect:
+                # handle the change the dropped echo reported
+                self._handle_event(
+                    win32.EVENT_OBJECT_LOCATIONCHANGE, hwnd, 0)
+        if len(self.echoes) > 0:
+            self._schedule_echo_check()
+
+    def _is_quarantined(self, hwnd):
+        if not self.quarantine.check(hwnd):
+            return False
+        self._schedule_quarantine_probe()
+        return True
 
-        # apply strategy
-        still_windows = [w for w in display_windows if w.hwnd !=
-                         self.movesize_window_handle]
-        logging.debug(
-            f"Applying strategy to {len(self.windows)} window(s) in display '{display}'.")
-        self.strategy.apply(display, still_windows,
-                            win32.GetForegroundWindow())
-
-    def _apply_strategy_to_display_by_window(self, hwnd):
+    def _schedule_quarantine_probe(self):
+        if self._probe_scheduled:
+            return
+        self._probe_scheduled = True
+        self.worker.call_later(config.hung_probe_interval() / 1000, self.worker.submit,
+                               PRIORITY_HOUSEKEEPING, self._probe_quarantine)
+
+    def _probe_quarantine(self):
+        """lays out the displays of quarantined windows that respond again"""
+        self._probe_scheduled = False
+        for hwnd in self.quarantine.probe():
+            self._schedule_display_by_window(hwnd)
+        if len(self.quarantine) > 0:
+            self._schedule_quarantine_probe()
+
+    def _schedule_display_by_window(self, hwnd):
         display = self._get_display_by_window_handle(hwnd)
         if display is not None:
-            self._apply_strategy_to_display(display)
+            self._mark_display_dirty(display)
 
-    def _update_tracked_windows(self, _, dwmsEventTime):
+    def _update_tracked_windows(self):
+        """tracks the windows that should be tracked and no others, returns the displays that changed"""
         hwnds = win32.EnumWindows()
-        window_handles = [
-            hwnd for hwnd in hwnds if self.window_tracker.should_track_handle(hwnd)]
+        self.window_tracker.prune(hwnds)
+        window_handles = {
+            hwnd for hwnd in hwnds if self.window_tracker.should_track_handle(hwnd)}
 
-        added = [
-            hwnd for hwnd in window_handles if hwnd not in self.window_tracker.tracked_window_handles]
-        removed = [
-            hwnd for hwnd in self.window_tracker.tracked_window_handles if hwnd not in window_handles]
+        tracked = self.window_tracker.tracked_window_handles
+        added = window_handles - tracked
+        removed = tracked - window_handles
 
+        changed = set()
         if len(added) > 0 or len(removed) > 0:
-            logging.debug(
-                f"Adding {len(added)} tracked window(s), removing {len(removed)}.")
+            logging.debug("Adding %d tracked window(s), removing %d.",
+                          len(added), len(removed))
             for w in added:
-                self.window_tracker.add_handle(w)
+                if self.window_tracker.add_handle(w):
+                    self.constraints.apply(self.window_tracker.get_window(w))
+                    self._update_window_display(w)
+                    changed.add(self._get_display_by_window_handle(w))
             for w in removed:
-                self.window_tracker.remove_handle(w)
+                changed.add(self._get_display_by_window_handle(w))
+                self._remove_window(w)
+        changed.discard(None)
+        return changed
+
+    def _schedule_config_poll(self):
+        self.worker.call_later(config.POLL_INTERVAL, self.worker.submit,
+                               PRIORITY_HOUSEKEEPING, self._poll_config)
+
+    def _poll_config(self):
+        config.reload_if_changed()
+        self._schedule_config_poll()
+
+    def _on_config_reloaded(self, previous, current):
+        self.worker.submit(PRIORITY_EVENT, self._apply_config,
+                           previous, current)
+
+    def _apply_config(self, previous, current):
+        """applies a reloaded config, laying out only the displays whose layout it changes"""
+        self.scheduler.quiet_time = current.relayout_delay / 1000
+        self.scheduler.max_latency = current.relayout_max_latency / 1000
+        self.quarantine.probe_timeout = current.hung_probe_timeout
+
+        dirty = set()
+        if (previous.ignored_classnames, previous.ignored_classname_pattern, previous.window_rules) != \
+                (current.ignored_classnames, current.ignored_classname_pattern, current.window_rules):
+            dirty |= self._reclassify_windows()
+
+        if (previous.display_padding, previous.window_margin, previous.partition_split_ratio) != \
+                (current.display_padding, current.window_margin, current.partition_split_ratio):
+            # these apply to every display
+            dirty |= set(self.displays.values())
+
+        self.strategy.config_changed(previous, current)
+        logging.debug("Config change affects %d display(s).", len(dirty))
+        for display in dirty:
+            self.scheduler.mark_dirty(display, reason="config")
+
+    def _reclassify_windows(self):
+        """re-applies the window rules to all windows, returns the displays that changed"""
+        tracker = self.window_tracker
+        actions = {hwnd: tracker.rule(hwnd)
+                   for hwnd in tracker.tracked_window_handles}
+        tracker.reclassify()
+        changed = self._update_tracked_windows()
+
+        # windows kept whose rule changed may float, sink back or move to another display
+        for hwnd, rule in actions.items():
+            if hwnd not in tracker.tracked_window_handles:
+                continue
+            current = tracker.rule(hwnd)
+            if (rule and (rule.action, rule.display)) == (current and (current.action, current.display)):
+                continue
+            changed.add(self._get_display_by_window_handle(hwnd))
+            self._update_window_display(hwnd)
+            changed.add(self._get_display_by_window_handle(hwnd))
+        changed.discard(None)
+        return changed
+
+    def _invalidate_tracking_decision(self, event, hwnd):
+        if event in (win32.EVENT_OBJECT_CREATE, win32.EVENT_OBJECT_DESTROY):
+            self.window_tracker.forget_handle(hwnd)
+        elif event in (win32.EVENT_OBJECT_SHOW,
+                       win32.EVENT_OBJECT_HIDE,
+                       win32.EVENT_OBJECT_LOCATIONCHANGE,  # maximize/restore
+                       win32.EVENT_SYSTEM_MINIMIZESTART,
+                       win32.EVENT_SYSTEM_MINIMIZEEND):
+            self.window_tracker.invalidate_handle(hwnd)
 
     def _on_object_create(self, hwnd, dwmsEventTime):
         if not self.window_tracker.should_track_handle(hwnd):
             return
 
-        logging.debug(f"[{hwnd}] object_create")
+        logging.debug("[%s] object_create", hwnd)
         self._start_tracking_window(hwnd)
 
     def _on_object_destroy(self, hwnd, dwmsEventTime):
         if hwnd in self.window_tracker.tracked_window_handles:
-            logging.debug(f"[{hwnd}] object_destroy")
+            logging.debug("[%s] object_destroy", hwnd)
             self._stop_tracking_window(hwnd)
 
     def _on_location_change(self, hwnd, dwmsEventTime):
         if hwnd == self.movesize_window_handle:
             return
 
+        window = self._get_tracked_window_by_handle(hwnd)
+        if window is not None and self._update_window_location(window, limit_rate=True):
+            # pretty_title may query the window, only read it when the record is kept
+            if logs.enabled_for(logging.DEBUG):
+                logging.debug("[%s] location_change: %s",
+                              hwnd, window.pretty_title)
+
+    def _on_name_change(self, hwnd, dwmsEventTime):
         window = self._get_tracked_window_by_handle(hwnd)
         if window is not None:
-            prev_size = window.display_size
-            window.refresh()
+            window.invalidate(rect=False, style=False)
 
-            if prev_size != window.display_size:
-                logging.debug(
-                    f"[{hwnd}] location_change: {window.pretty_title}")
-                self._apply_strategy_to_display_by_window(hwnd)
+        # title rules may start or stop matching
+        if not self.window_tracker.invalidate_title(hwnd):
+            return
+        display = self._get_display_by_window_handle(hwnd)
+        rule = self.window_tracker.rule(hwnd)
+        if not self.window_tracker.should_track_handle(hwnd):
+            if window is not None:
+                self._stop_tracking_window(hwnd)
+        elif window is None:
+            self._start_tracking_window(hwnd)
+        elif rule is not self.window_tracker.rule(hwnd):
+            self._update_window_display(hwnd)
+            if display is not None:
+                self._mark_display_dirty(display)
+            self._schedule_display_by_window(hwnd)
 
     def _on_movesize_start(self, hwnd, dwmsEventTime):
         if hwnd in self.window_tracker.tracked_window_handles:
-            logging.debug(f"[{hwnd}] Start moving")
+            logging.debug("[%s] Start moving", hwnd)
             self.movesize_window_handle = hwnd
-            self._apply_strategy_to_display_by_window(hwnd)
+            # whatever happens to the window now is the user's doing
+            self._get_tracked_window_by_handle(hwnd).requested_size = None
+            self.echoes.discard(hwnd)
+            self._schedule_display_by_window(hwnd)
 
     def _on_movesize_end(self, hwnd, dwmsEventTime):
         if hwnd != self.movesize_window_handle:
             return
 
-        logging.debug(f"[{hwnd}] Stopped moving")
+        logging.debug("[%s] Stopped moving", hwnd)
         self.movesize_window_handle = None
-        self._apply_strategy_to_display_by_window(hwnd)
+        window = self._get_tracked_window_by_handle(hwnd)
+        if window is None:
+            return
+        moved = self._update_window_location(window)
+        display = self._get_display_by_window_handle(hwnd)
+        if moved and display is not None:
+            # dropped on another tile of the same display, a window dropped on another display is inserted there
+            self.strategy.window_dropped(display, window)
+        if not moved:
+            self._schedule_display_by_window(hwnd)
+
+    def _update_window_location(self, window, limit_rate=False):
+        """re-reads the window's rect, schedules its old and new display if it moved
+
+        With limit_rate, displays are not scheduled once the window caused too many
+        relayouts in the last second."""
+        prev_size = window.display_size
+        prev_display = self._get_display_by_window_handle(window.hwnd)
+        window.invalidate(title=False)
+        if prev_size == window.display_size:
+            return False
+
+        self._check_refused_move(window, prev_display)
+        self._update_window_display(window.hwnd)
+        display = self._get_display_by_window_handle(window.hwnd)
+        if limit_rate and not self._allow_window_relayout(window):
+            return True
+        if prev_display is not None and prev_display != display:
+            self._mark_display_dirty(prev_display)
+        self._schedule_display_by_window(window.hwnd)
+        return True
+
+    def _check_refused_move(self, window, display):
+        """compares the window's rect with the one last requested, learning from a refused move"""
+        requested = window.requested_size
+        if requested is None:
+            return
+        if time.monotonic() - window.requested_at > MOVE_RESPONSE_TIME:
+            window.requested_size = None
+            return
+        if window.display_size == requested:
+            return
+
+        # the strategy will not ask for this rect again while the window keeps the one it took
+        window.refused = (requested, window.display_size)
+        metrics.increment("refused_moves_total")
+        logging.debug("[%s] Window took %s instead of %s.",
+                      window.hwnd, window.display_size, requested)
+        if self.constraints.observe(window, requested, window.display_size) and display is not None:
+            self.strategy.constraints_changed(display, window)
+
+    def _allow_window_relayout(self, window):
+        """counts a relayout caused by window, returns False once it caused MaxWindowRelayouts in the last second"""
+        limit = config.max_window_relayouts()
+        if limit <= 0:
+            return True
+        now = time.monotonic()
+        times = self._window_relayouts.setdefault(
+            window.hwnd, collections.deque())
+        while len(times) > 0 and now - times[0] > 1.0:
+            times.popleft()
+        if len(times) < limit:
+            times.append(now)
+            self._capped_windows.discard(window.hwnd)
+            return True
+
+        metrics.increment("window_relayouts_capped_total")
+        if window.hwnd not in self._capped_windows:
+            self._capped_windows.add(window.hwnd)
+            logging.warning("[%s] '%s' keeps moving, ignoring it for layouts for up to a second.",
+                            window.hwnd, window.classname)
+        return False
 
     def _on_minimize_start(self, hwnd, dwmsEventTime):
         if hwnd in self.window_tracker.tracked_window_handles:
-            logging.debug(f"[{hwnd}] minimize_start")
+            logging.debug("[%s] minimize_start", hwnd)
             self._stop_tracking_window(hwnd)
 
     def _on_minimize_end(self, hwnd, dwmsEventTime):
@@ -185,56 +686,45 @@ class WindowManager(object):
             return
 
         if hwnd not in self.window_tracker.tracked_window_handles:
-            logging.debug(f"[{hwnd}] minimize_end")
+            logging.debug("[%s] minimize_end", hwnd)
             self._start_tracking_window(hwnd)
 
     def _get_display_by_window_handle(self, hwnd):
-        if hwnd not in self.window_tracker.tracked_window_handles:
+        display_hwnd = self.window_tracker.registry.get_display(hwnd)
+        if display_hwnd is None:
             return None
+        return self.displays.get(display_hwnd)
 
-        for display in self.displays:
-            if display.contains_window(hwnd):
-                return display
-        return None
+    def _get_pinned_display(self, hwnd):
+        """returns the Display a pin rule assigns hwnd to, displays are numbered from 1 in enumeration order"""
+        number = self.window_tracker.pinned_display(hwnd)
+        if number is None:
+            return None
+        displays = list(self.displays.values())
+        if not 1 <= number <= len(displays):
+            return None
+        return displays[number - 1]
 
     def _get_tracked_window_by_handle(self, hwnd):
-        if hwnd not in self.window_tracker.tracked_window_handles:
-            return None
+        return self.window_tracker.get_window(hwnd)
 
-        for w in self.windows:
-            if w.hwnd == hwnd:
-                return w
-        return None
+    def _update_window_display(self, hwnd):
+        """assigns hwnd to the display containing it in the registry
 
-    def _should_track_window(self, hwnd):
-        try:
-            # check styles
-            style = win32.GetWindowStyles(hwnd)
-            popup = bool(style & win32con.WS_POPUP)
-            visible = bool(style & win32con.WS_VISIBLE)
-            maxbox = bool(style & win32con.WS_MAXIMIZEBOX)
-            minbox = bool(style & win32con.WS_MINIMIZEBOX)
-            if popup or not maxbox or not minbox:
-                return False
-
-            # check visibility
-            visible = win32.IsWindowVisible(hwnd)
-            if not visible:
-                return False
-
-            iconic = win32.IsIconic(hwnd)
-            if iconic:
-                return False
-
-            zoomed = ctypes.windll.user32.IsZoomed(hwnd)
-            if zoomed:
-                return False
-
-            # check ignored classnames
-            classname = win32.GetWindowClassName(hwnd)
-            if classname in config.ignored_classnames():
-                return False
+        MonitorFromWindow is only called once the window's rect leaves its current display"""
+        window = self.window_tracker.get_window(hwnd)
+        if window is None:
+            return
 
-            return True
-        except:
-            return False
+        pinned = self._get_pinned_display(hwnd)
+        if pinned is not None:
+            self.window_tracker.registry.set_display(hwnd, int(pinned.hwnd))
+            return
+
+        display = self._get_display_by_window_handle(hwnd)
+        if display is not None and display.contains_rect(window.display_size):
+            return
+
+        display_hwnd = int(win32.MonitorFromWindow(hwnd))
+        if display_hwnd in self.displays:
+            self.window_tracker.registry.set_display(hwnd, display_hwnd)
@@ -0,0 +1,56 @@
+import logging
+import time
+
+import wimpy.win32 as win32
+
+
+class WindowQuarantine(object):
+    """Keeps windows of hung applications out of relayouts until they respond again"""
+
+    def __init__(self, probe_timeout):
+        """probe_timeout is in milliseconds"""
+        self.probe_timeout = probe_timeout
+        self.hwnds = {}  # hwnd -> monotonic time it was quarantined
+
+        # counters
+        self.quarantined = 0
+        self.released = 0
+
+    def check(self, hwnd):
+        """returns True if hwnd is quarantined, quarantining it if Windows reports it as hung"""
+        if hwnd in self.hwnds:
+            return True
+        if not win32.IsHungAppWindow(hwnd):
+            return False
+
+        self.hwnds[hwnd] = time.monotonic()
+        self.quarantined += 1
+        logging.warning("[%s] Window is not responding, excluding it from layouts.",
+                        hwnd)
+        return True
+
+    def probe(self):
+        """sends WM_NULL to every quarantined window, releases and returns the ones that answered"""
+        recovered = []
+        for hwnd, since in list(self.hwnds.items()):
+            if not win32.IsWindow(hwnd):
+                del self.hwnds[hwnd]
+                continue
+            if win32.IsHungAppWindow(hwnd) or not win32.SendMessageTimeout(hwnd, win32.WM_NULL, self.probe_timeout):
+                continue
+
+            del self.hwnds[hwnd]
+            self.released += 1
+            recovered.append(hwnd)
+            logging.info("[%s] Window responds again after %.1f s.",
+                         hwnd, time.monotonic() - since)
+        return recovered
+
+    def release(self, hwnd):
+        self.hwnds.pop(hwnd, None)
+
+    def __contains__(self, hwnd):
+        return hwnd in self.hwnds
+
+    def __len__(self):
+        return len(self.hwnds)
@@ -0,0 +1,89 @@
+class WindowRegistry(object):
+    """Tracked windows indexed by handle and by display"""
+
+    def __init__(self):
+        self._windows = {}  # hwnd -> Window
+        self._window_displays = {}  # hwnd -> display hwnd
+        self._display_windows = {}  # display hwnd -> {hwnd: Window}
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """calls listener(hwnd, old display hwnd, new display hwnd) whenever a window's display changes
+
+        Either display is None while the window is not on one, i.e. before it was
+        assigned one and after it was removed."""
+        self._listeners.append(listener)
+
+    def __contains__(self, hwnd):
+        return hwnd in self._windows
+
+    def __iter__(self):
+        return iter(self._windows.values())
+
+    def __len__(self):
+        return len(self._windows)
+
+    def handles(self):
+        """returns a live, set-like view of the tracked handles"""
+        return self._windows.keys()
+
+    def get(self, hwnd):
+        return self._windows.get(hwnd)
+
+    def add(self, window, display_hwnd=None):
+        if window.hwnd in self._windows:
+            return False
+        self._windows[window.hwnd] = window
+        if display_hwnd is not None:
+            self.set_display(window.hwnd, display_hwnd)
+        return True
+
+    def remove(self, hwnd):
+        """removes hwnd from all indexes, returning its Window (or None)"""
+        window = self._windows.pop(hwnd, None)
+        if window is not None:
+            self._unset_display(hwnd)
+        return window
+
+    def clear(self):
+        for hwnd, display_hwnd in list(self._window_displays.items()):
+            self._notify(hwnd, display_hwnd, None)
+        self._windows.clear()
+        self._window_displays.clear()
+        self._display_windows.clear()
+
+    def get_display(self, hwnd):
+        """returns the handle of the display hwnd was last assigned to (or None)"""
+        return self._window_displays.get(hwnd)
+
+    def set_display(self, hwnd, display_hwnd):
+        window = self._windows.get(hwnd)
+        if window is None:
+            return False
+        previous = self._window_displays.get(hwnd)
+        if previous == display_hwnd:
+            return False
+
+        self._unset_display(hwnd, notify=False)
+        self._window_displays[hwnd] = display_hwnd
+        self._display_windows.setdefault(display_hwnd, {})[hwnd] = window
+        self._notify(hwnd, previous, display_hwnd)
+        return True
+
+    def windows_on_display(self, display_hwnd):
+        return list(self._display_windows.get(display_hwnd, {}).values())
+
+    def _unset_display(self, hwnd, notify=True):
+        display_hwnd = self._window_displays.pop(hwnd, None)
+        if display_hwnd is None:
+            return
+        display_windows = self._display_windows[display_hwnd]
+        del display_windows[hwnd]
+        if len(display_windows) == 0:
+            del self._display_windows[display_hwnd]
+        if notify:
+            self._notify(hwnd, display_hwnd, None)
+
+    def _notify(self, hwnd, old_display_hwnd, new_display_hwnd):
+        for listener in self._listeners:
+            listener(hwnd, old_display_hwnd, new_display_hwnd)
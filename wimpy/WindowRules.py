@@ -0,0 +1,157 @@
+import collections
+import fnmatch
+import re
+
+# the rules that can apply to windows of one class name and process
+Candidates = collections.namedtuple("Candidates", [
+    "rules",  # tuple of rules, in config order
+    "needs_title",
+    "needs_exstyle",
+    "static_rule"  # the first rule if it applies regardless of title and style, else None
+])
+
+NO_CANDIDATES = Candidates((), False, False, None)
+
+
+def _is_wildcard(value):
+    return any(ch in value for ch in "*?[")
+
+
+class _CompiledRule(object):
+
+    def __init__(self, index, rule=None, classname=None, classname_pattern=None, action="ignore"):
+        self.index = index
+        self.name = rule.name if rule is not None else "IgnoredClassnames"
+        self.classname = classname
+        self.classname_pattern = classname_pattern
+        self.process = None
+        self.process_pattern = None
+        self.title = None
+        self.style = self.not_style = self.exstyle = self.not_exstyle = 0
+        self.action = action
+        self.display = None
+        if rule is None:
+            return
+
+        if rule.classname is not None:
+            if _is_wildcard(rule.classname):
+                self.classname_pattern = re.compile(
+                    fnmatch.translate(rule.classname))
+            else:
+                self.classname = rule.classname
+        if rule.process is not None:
+            # executable names are case insensitive
+            process = rule.process.lower()
+            if _is_wildcard(process):
+                self.process_pattern = re.compile(fnmatch.translate(process))
+            else:
+                self.process = process
+        self.title = rule.title
+        self.style = rule.style
+        self.not_style = rule.not_style
+        self.exstyle = rule.exstyle
+        self.not_exstyle = rule.not_exstyle
+        self.action = rule.action
+        self.display = rule.display
+
+    @property
+    def uses_process(self):
+        return self.process is not None or self.process_pattern is not None
+
+    @property
+    def is_static(self):
+        return self.title is None and not (self.style or self.not_style or self.exstyle or self.not_exstyle)
+
+    def matches_static(self, classname, process):
+        if self.classname is not None and classname != self.classname:
+            return False
+        if self.classname_pattern is not None and self.classname_pattern.match(classname) is None:
+            return False
+        if self.process is not None and process != self.process:
+            return False
+        if self.process_pattern is not None and (process is None or self.process_pattern.match(process) is None):
+            return False
+        return True
+
+    def matches(self, style, exstyle, title):
+        if style & self.style != self.style or style & self.not_style:
+            return False
+        if exstyle & self.exstyle != self.exstyle or exstyle & self.not_exstyle:
+            return False
+        return self.title is None or self.title.search(title) is not None
+
+    def __repr__(self):
+        return f"<rule '{self.name}': {self.action}>"
+
+
+class WindowRules(object):
+    """Window rules compiled into a decision table indexed by class name and process
+
+    Rules naming an exact class name or executable are only looked at for windows
+    of that class or process. Which rules can apply to a (class name, process) pair
+    is worked out once, leaving only the title and style checks per window."""
+
+    def __init__(self, rules=(), ignored_classnames=frozenset(), ignored_classname_pattern=None):
+        compiled = []
+        # IgnoredClassnames are plain ignore rules ahead of all others
+        for classname in sorted(ignored_classnames):
+            compiled.append(_CompiledRule(len(compiled), classname=classname))
+        if ignored_classname_pattern is not None:
+            compiled.append(_CompiledRule(
+                len(compiled), classname_pattern=ignored_classname_pattern))
+        for rule in rules:
+            compiled.append(_CompiledRule(len(compiled), rule))
+
+        self._by_classname = {}  # class name -> [rule]
+        self._by_process = {}  # lowercase executable name -> [rule]
+        self._unindexed = []  # rules checked against every window
+        for rule in compiled:
+            if rule.classname is not None:
+                self._by_classname.setdefault(rule.classname, []).append(rule)
+            elif rule.process is not None:
+                self._by_process.setdefault(rule.process, []).append(rule)
+            else:
+                self._unindexed.append(rule)
+
+        self._candidates = {}  # (class name, process) -> Candidates
+        self.uses_process = any(rule.uses_process for rule in compiled)
+        self.rule_count = len(compiled)
+
+    @classmethod
+    def from_config(cls, snapshot):
+        return cls(snapshot.window_rules, snapshot.ignored_classnames, snapshot.ignored_classname_pattern)
+
+    def candidates(self, classname, process=None):
+        """returns the Candidates for windows of classname and process (a lowercase executable name)"""
+        key = (classname, process)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            candidates = self._compute_candidates(classname, process)
+            self._candidates[key] = candidates
+        return candidates
+
+    def match(self, candidates, style, exstyle, title):
+        """returns the first of candidates matching the window's style, extended style and title, or None"""
+        for rule in candidates.rules:
+            if rule.matches(style, exstyle, title):
+                return rule
+        return None
+
+    def _compute_candidates(self, classname, process):
+        rules = self._by_classname.get(classname, []) + \
+            self._by_process.get(process, []) + self._unindexed
+        rules = tuple(sorted((r for r in rules if r.matches_static(classname, process)),
+                             key=lambda r: r.index))
+        if len(rules) == 0:
+            return NO_CANDIDATES
+
+        # rules after one that always applies are never reached
+        for i, rule in enumerate(rules):
+            if rule.is_static:
+                rules = rules[:i + 1]
+                break
+        return Candidates(
+            rules=rules,
+            needs_title=any(r.title is not None for r in rules),
+            needs_exstyle=any(r.exstyle or r.not_exstyle for r in rules),
+            static_rule=rules[0] if rules[0].is_static else None)
@@ -1,77 +1,191 @@
-import ctypes
 import logging
-import win32con
 
 import wimpy.config as config
 import wimpy.win32 as win32
 
+from wimpy.ProcessNameCache import ProcessNameCache
+from wimpy.Window import Window
+from wimpy.WindowRegistry import WindowRegistry
+from wimpy.WindowRules import WindowRules
+
 
 class WindowTracker(object):
     """description of class"""
 
     def __init__(self):
-        self.tracked_window_handles = set()
+        self.registry = WindowRegistry()
+        self.rules = WindowRules.from_config(config.snapshot())
+        self.process_names = ProcessNameCache()
+
+        # hwnd -> {"candidates", "ignored", "rule", "inputs", "title", "state"}
+        # class name and process never change, so neither do the candidate rules; the
+        # matched rule is kept until the style or title it was matched on changes.
+        # state is None once invalidated
+        self._decisions = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def tracked_window_handles(self):
+        return self.registry.handles()
+
+    def windows(self):
+        return list(self.registry)
 
-    def refresh(self):
-        handles = win32.EnumWindows()
-        to_track = [h for h in handles if self.should_track_handle(h)]
-        self.tracked_window_handles = to_track
+    def get_window(self, hwnd):
+        return self.registry.get(hwnd)
 
     def add_handle(self, hwnd):
-        if hwnd in self.tracked_window_handles:
-            logging.debug(f"[{hwnd}] Ignoring duplicate window")
+        if hwnd in self.registry:
+            logging.debug("[%s] Ignoring duplicate window", hwnd)
             return False
         if not self.should_track_handle(hwnd):
-            logging.debug(f"[{hwnd}] Ignoring window")
+            logging.debug("[%s] Ignoring window", hwnd)
             return False
 
-        self.tracked_window_handles.append(hwnd)
-        logging.debug(f"[{hwnd}] Tracking window")
+        self.registry.add(Window(hwnd))
+        logging.debug("[%s] Tracking window", hwnd)
         return True
 
     def remove_handle(self, hwnd):
-        if hwnd in self.tracked_window_handles:
-            self.tracked_window_handles.remove(hwnd)
-            logging.debug(f"[{hwnd}] Stopped tracking window")
+        if self.registry.remove(hwnd) is not None:
+            logging.debug("[%s] Stopped tracking window", hwnd)
             return True
         return False
 
     def should_track_handle(self, hwnd):
+        decision = self._decisions.get(hwnd)
+        if decision is not None and (decision["ignored"] or decision["state"] is not None):
+            self.cache_hits += 1
+            return not decision["ignored"] and decision["state"]
 
+        self.cache_misses += 1
         try:
-            # check styles
-            style = win32.GetWindowStyles(hwnd)
-            caption = bool(style & win32con.WS_CAPTION)
-            clip_children = bool(style & win32con.WS_CLIPCHILDREN)
-            popup = bool(style & win32con.WS_POPUP)
-            visible = bool(style & win32con.WS_VISIBLE)
-            maxbox = bool(style & win32con.WS_MAXIMIZEBOX)
-            minbox = bool(style & win32con.WS_MINIMIZEBOX)
-            if not caption or not maxbox or not minbox:
-                return False
-            if not clip_children and popup:
-                return False
-
-            # check visibility
-            visible = win32.IsWindowVisible(hwnd)
-            if not visible:
-                return False
-
-            iconic = win32.IsIconic(hwnd)
-            if iconic:
-                return False
-
-            zoomed = ctypes.windll.user32.IsZoomed(hwnd)
-            if zoomed:
-                return False
-
-            # check ignored classnames
-            classname = win32.GetWindowClassName(hwnd)
-            if classname in config.ignored_classnames():
-                return False
+            if decision is None:
+                decision = self._new_decision(hwnd)
+                self._decisions[hwnd] = decision
+                if decision["ignored"]:
+                    return False
 
-            return True
+            style = win32.GetWindowStyles(hwnd)
+            rule = self._match_rule(hwnd, decision, style)
+            if rule is not None and rule.action == "ignore":
+                decision["state"] = False
+            else:
+                decision["state"] = self._should_track_state(hwnd, style)
+            return decision["state"]
         except:
-            logging.error(
-                f"[{hwnd}] Error in should_track_handle:", exc_info=True)
+            # queued events may refer to windows destroyed meanwhile
+            if win32.IsWindow(hwnd):
+                logging.error("[%s] Error in should_track_handle:",
+                              hwnd, exc_info=True)
+            return False
+
+    def rule(self, hwnd):
+        """returns the rule last matched by hwnd, or None"""
+        decision = self._decisions.get(hwnd)
+        return decision["rule"] if decision is not None else None
+
+    def is_floating(self, hwnd):
+        rule = self.rule(hwnd)
+        return rule is not None and rule.action == "float"
+
+    def pinned_display(self, hwnd):
+        """returns the 1-based display hwnd is pinned to, or None"""
+        rule = self.rule(hwnd)
+        return rule.display if rule is not None and rule.action == "pin" else None
+
+    def invalidate_title(self, hwnd):
+        """forgets the title of hwnd, returns True if rules depend on it"""
+        decision = self._decisions.get(hwnd)
+        if decision is None or not decision["candidates"].needs_title:
+            return False
+        decision["title"] = None
+        decision["state"] = None
+        return True
+
+    def invalidate_handle(self, hwnd):
+        """forgets the style and visibility part of a tracking decision"""
+        decision = self._decisions.get(hwnd)
+        if decision is not None:
+            decision["state"] = None
+
+    def forget_handle(self, hwnd):
+        """forgets the whole tracking decision, for destroyed (or reused) handles"""
+        self._decisions.pop(hwnd, None)
+        self.process_names.release(hwnd)
+
+    def prune(self, handles):
+        """forgets the tracking decisions of all windows but handles, whose destruction may have been missed"""
+        handles = set(handles)
+        for hwnd in [h for h in self._decisions if h not in handles]:
+            self.forget_handle(hwnd)
+
+    def invalidate_all(self):
+        for decision in self._decisions.values():
+            decision["state"] = None
+
+    def reclassify(self):
+        """recompiles the rules and forgets all decisions, after the config changed"""
+        self.rules = WindowRules.from_config(config.snapshot())
+        self._decisions.clear()
+        self.process_names.clear()
+
+    def _new_decision(self, hwnd):
+        classname = win32.GetWindowClassName(hwnd)
+        process = self.process_names.name(
+            hwnd) if self.rules.uses_process else None
+        candidates = self.rules.candidates(classname, process)
+        static_rule = candidates.static_rule
+        return {
+            "candidates": candidates,
+            "ignored": static_rule is not None and static_rule.action == "ignore",
+            "rule": static_rule,
+            "inputs": None,
+            "title": None,
+            "state": None
+        }
+
+    def _match_rule(self, hwnd, decision, style):
+        candidates = decision["candidates"]
+        if candidates.static_rule is not None or len(candidates.rules) == 0:
+            return candidates.static_rule
+
+        exstyle = win32.GetWindowExStyles(
+            hwnd) if candidates.needs_exstyle else 0
+        if candidates.needs_title and decision["title"] is None:
+            decision["title"] = win32.GetWindowText(hwnd)
+        inputs = (style, exstyle, decision["title"])
+        if inputs != decision["inputs"]:
+            decision["inputs"] = inputs
+            decision["rule"] = self.rules.match(
+                candidates, style, exstyle, decision["title"])
+        return decision["rule"]
+
+    def _should_track_state(self, hwnd, style):
+        # check styles
+        caption = bool(style & win32.WS_CAPTION)
+        clip_children = bool(style & win32.WS_CLIPCHILDREN)
+        popup = bool(style & win32.WS_POPUP)
+        visible = bool(style & win32.WS_VISIBLE)
+        maxbox = bool(style & win32.WS_MAXIMIZEBOX)
+        minbox = bool(style & win32.WS_MINIMIZEBOX)
+        if not caption or not maxbox or not minbox:
+            return False
+        if not clip_children and popup:
             return False
+
+        # check visibility
+        visible = win32.IsWindowVisible(hwnd)
+        if not visible:
+            return False
+
+        iconic = win32.IsIconic(hwnd)
+        if iconic:
+            return False
+
+        zoomed = win32.IsZoomed(hwnd)
+        if zoomed:
+            return False
+
+        return True
@@ -0,0 +1,125 @@
+# numpy (and scipy, if installed) are imported on first use, they are only needed when
+# a layout is built from scratch
+
+
+def overlap_matrix(rects_a, rects_b):
+    """returns the len(rects_a) x len(rects_b) matrix of overlap areas between (l, t, r, b) rects"""
+    import numpy as np
+
+    a = np.asarray(rects_a, dtype=np.float64).reshape(-1, 1, 4)
+    b = np.asarray(rects_b, dtype=np.float64).reshape(1, -1, 4)
+    width = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    height = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    return np.clip(width, 0, None) * np.clip(height, 0, None)
+
+
+def center_distance_matrix(rects_a, rects_b):
+    """returns the len(rects_a) x len(rects_b) matrix of distances between rect centers"""
+    import numpy as np
+
+    a = np.asarray(rects_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(rects_b, dtype=np.float64).reshape(-1, 4)
+    center_a = (a[:, :2] + a[:, 2:]) / 2
+    center_b = (b[:, :2] + b[:, 2:]) / 2
+    return np.linalg.norm(center_a[:, None, :] - center_b[None, :, :], axis=2)
+
+
+def split_assignment(weights, left_count, tie_break=None):
+    """returns the (left, right) row indices maximizing the total weight of left_count rows in column 0 and the rest in column 1
+
+    weights has two columns. The rows gaining most from column 0 over column 1 go
+    left, rows gaining equally by the smaller tie_break[:, 0] - tie_break[:, 1]."""
+    import numpy as np
+
+    weights = np.asarray(weights, dtype=np.float64)
+    keys = [-(weights[:, 0] - weights[:, 1])]
+    if tie_break is not None:
+        tie_break = np.asarray(tie_break, dtype=np.float64)
+        # lexsort sorts by the last key first
+        keys.insert(0, tie_break[:, 0] - tie_break[:, 1])
+    order = np.lexsort(keys)
+    return sorted(order[:left_count].tolist()), sorted(order[left_count:].tolist())
+
+
+def max_weight_assignment(weights):
+    """returns, for every row, the column maximizing the total weight of a one-to-one assignment
+
+    weights has at most as many rows as columns. Uses scipy if it is installed, a
+    Hungarian algorithm with potentials otherwise, O(rows^2 * columns) with the
+    inner loop vectorized."""
+    import numpy as np
+
+    rows, columns = np.shape(weights)
+    if rows > columns:
+        raise ValueError(f"Cannot assign {rows} rows to {columns} columns")
+
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        pass
+    else:
+        row_indices, column_indices = linear_sum_assignment(
+            np.asarray(weights, dtype=np.float64), maximize=True)
+        assignment = [0] * rows
+        for row, column in zip(row_indices, column_indices):
+            assignment[row] = int(column)
+        return assignment
+
+    # 1-based, index 0 is the virtual column the augmenting path starts from
+    cost = np.zeros((rows, columns + 1))
+    cost[:, 1:] = -np.asarray(weights, dtype=np.float64)
+    u = np.zeros(rows + 1)
+    v = np.zeros(columns + 1)
+    row_of = np.zeros(columns + 1, dtype=np.int64)  # column -> assigned row, 0 if free
+    way = np.zeros(columns + 1, dtype=np.int64)
+
+    # row minima are feasible potentials, match every row whose best column is still free
+    # so only the conflicting rows need an augmenting path
+    best = np.argmin(cost[:, 1:], axis=1) + 1
+    u[1:] = cost[np.arange(rows), best]
+    unmatched = []
+    for row, column in enumerate(best, 1):
+        if row_of[column] == 0:
+            row_of[column] = row
+        else:
+            unmatched.append(row)
+
+    inf = np.inf
+    for row in unmatched:
+        row_of[0] = row
+        column = 0
+        min_slack = np.full(columns + 1, inf)
+        used = np.zeros(columns + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = row_of[column]
+            # index 0 is always used, so it never becomes a candidate
+            slack = cost[current_row - 1] - u[current_row] - v
+            better = slack < min_slack
+            better &= ~used
+            min_slack[better] = slack[better]
+            way[better] = column
+
+            candidates = np.where(used, inf, min_slack)
+            next_column = candidates.argmin()
+            delta = candidates[next_column]
+
+            u[row_of[used]] += delta
+            v[used] -= delta
+            min_slack -= delta
+
+            column = next_column
+            if row_of[column] == 0:
+                break
+
+        # flip the augmenting path
+        while column != 0:
+            previous = way[column]
+            row_of[column] = row_of[previous]
+            column = previous
+
+    assignment = [0] * rows
+    for column in range(1, columns + 1):
+        if row_of[column] != 0:
+            assignment[row_of[column] - 1] = column - 1
+    return assignment
@@ -1,16 +1,145 @@
+import collections
 import configparser
+import fnmatch
 import logging
 import os
+import re
+import threading
 
-_data = {}
+import wimpy.win32 as win32
 
+# seconds between checks of the config file for changes
+POLL_INTERVAL = 1.0
 
-def _parse_config(config):
-    global _data
-    _data["DisplayPadding"] = _parse_margin(config["DisplayPadding"])
-    _data["WindowMargin"] = _parse_margin(config["WindowMargin"])
-    _data["IgnoredClassnames"] = _parse_list(config["IgnoredClassnames"])
-    _data["PartitionSplitRatio"] = float(config["PartitionSplitRatio"])
+# prefix of the sections holding window rules, e.g. [Rule Calculator]
+RULE_SECTION_PREFIX = "Rule "
+
+RULE_ACTIONS = ("ignore", "float", "pin")
+
+# immutable snapshot of the whole config, replaced as a whole on reload
+Config = collections.namedtuple("Config", [
+    "display_padding",
+    "window_margin",
+    "ignored_classnames",  # frozenset of exact class names
+    "ignored_classname_pattern",  # compiled regex of the wildcard entries, or None
+    "partition_split_ratio",
+    "window_rules",  # tuple of Rule, in file order
+    "relayout_delay",
+    "relayout_max_latency",
+    "max_window_relayouts",
+    "sweep_interval",
+    "async_positioning",
+    "hung_probe_interval",
+    "hung_probe_timeout",
+    "slow_placement",
+    "metrics_enabled",
+    "metrics_export_path",
+    "metrics_export_interval",
+    "log_level",
+    "log_max_bytes",
+    "log_backup_count",
+    "log_ring_buffer_size"
+])
+
+# a window rule as written in config.ini, compiled by wimpy.WindowRules
+Rule = collections.namedtuple("Rule", [
+    "name",
+    "process",  # executable name, may use wildcards
+    "classname",  # may use wildcards
+    "title",  # compiled regex searched in the title, or None
+    "style",  # WS_* flags the window must have
+    "not_style",  # WS_* flags it must not have
+    "exstyle",  # WS_EX_* flags it must have
+    "not_exstyle",  # WS_EX_* flags it must not have
+    "action",  # one of RULE_ACTIONS
+    "display"  # 1-based display of the pin action
+])
+
+_snapshot = None
+_path = None
+_stat = None
+_listeners = []
+_reload_lock = threading.Lock()
+
+
+def _parse_config(config, data):
+    data["display_padding"] = _parse_margin(config["DisplayPadding"])
+    data["window_margin"] = _parse_margin(config["WindowMargin"])
+    classnames, pattern = _parse_classnames(
+        _parse_list(config["IgnoredClassnames"]))
+    data["ignored_classnames"] = classnames
+    data["ignored_classname_pattern"] = pattern
+    data["partition_split_ratio"] = float(config["PartitionSplitRatio"])
+
+
+def _parse_events(config, data):
+    data["relayout_delay"] = int(config.get("RelayoutDelay", "25"))
+    data["relayout_max_latency"] = int(config.get("RelayoutMaxLatency", "100"))
+    data["max_window_relayouts"] = int(config.get("MaxWindowRelayouts", "5"))
+    data["sweep_interval"] = int(config.get("SweepInterval", "10000"))
+
+
+def _parse_placement(config, data):
+    data["async_positioning"] = _parse_bool(config.get("AsyncPositioning", "true"))
+    data["hung_probe_interval"] = int(config.get("HungProbeInterval", "2000"))
+    data["hung_probe_timeout"] = int(config.get("HungProbeTimeout", "100"))
+    data["slow_placement"] = float(config.get("SlowPlacement", "50"))
+
+
+def _parse_metrics(config, data):
+    data["metrics_enabled"] = _parse_bool(config.get("Enabled", "false"))
+    data["metrics_export_path"] = config.get("ExportPath", "").strip() or None
+    data["metrics_export_interval"] = float(config.get("ExportInterval", "15"))
+
+
+def _parse_logging(config, data):
+    level = logging.getLevelName(config.get("Level", "DEBUG").strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level '{config['Level']}'")
+    data["log_level"] = level
+    data["log_max_bytes"] = int(config.get("MaxBytes", "1048576"))
+    data["log_backup_count"] = int(config.get("BackupCount", "3"))
+    data["log_ring_buffer_size"] = int(config.get("RingBufferSize", "500"))
+
+
+def _parse_rules(parser, data):
+    rules = []
+    for section in parser.sections():
+        if not section.startswith(RULE_SECTION_PREFIX):
+            continue
+        config = parser[section]
+        action = config.get("Action", "ignore").strip().lower()
+        if action not in RULE_ACTIONS:
+            raise ValueError(f"Unknown action '{action}' in [{section}]")
+        display = int(config["Display"]) if action == "pin" else None
+        title = config.get("Title", "").strip()
+        style, not_style, exstyle, not_exstyle = _parse_styles(
+            config.get("Style", "").split())
+        rules.append(Rule(
+            name=section[len(RULE_SECTION_PREFIX):].strip(),
+            process=config.get("Process", "").strip() or None,
+            classname=config.get("Classname", "").strip() or None,
+            title=re.compile(title) if title else None,
+            style=style,
+            not_style=not_style,
+            exstyle=exstyle,
+            not_exstyle=not_exstyle,
+            action=action,
+            display=display))
+    data["window_rules"] = tuple(rules)
+
+
+def _parse_styles(names):
+    """returns the (style, not_style, exstyle, not_exstyle) masks of names like WS_POPUP or !WS_EX_TOOLWINDOW"""
+    masks = [0, 0, 0, 0]
+    for name in names:
+        excluded = name.startswith("!")
+        name = name.lstrip("!").upper()
+        flag = getattr(win32, name, None) if name.startswith("WS_") else None
+        if not isinstance(flag, int):
+            raise ValueError(f"Unknown window style '{name}'")
+        masks[(2 if name.startswith("WS_EX_") else 0) + excluded] |= flag
+    return tuple(masks)
 
 
 def _parse_margin(margin):
@@ -26,24 +155,178 @@ def _parse_list(list):
     return [i.strip() for i in items]
 
 
+def _parse_bool(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_classnames(classnames):
+    """splits class names into a frozenset of exact names and one compiled pattern of the wildcard ones"""
+    exact = frozenset(c for c in classnames if c and not any(ch in c for ch in "*?["))
+    wildcards = [c for c in classnames if c and c not in exact]
+    if len(wildcards) == 0:
+        return exact, None
+    return exact, re.compile("|".join(fnmatch.translate(w) for w in wildcards))
+
+
+def _read(path):
+    parser = configparser.ConfigParser()
+    if not parser.read(path, encoding="utf-8"):
+        raise FileNotFoundError(f"Config file '{path}' not found")
+    data = {}
+    _parse_config(parser["Display"], data)
+    _parse_events(parser["Events"] if parser.has_section("Events") else {}, data)
+    _parse_placement(parser["Placement"] if parser.has_section("Placement") else {}, data)
+    _parse_metrics(parser["Metrics"] if parser.has_section("Metrics") else {}, data)
+    _parse_logging(parser["Logging"] if parser.has_section("Logging") else {}, data)
+    _parse_rules(parser, data)
+    return Config(**data)
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
 def load_file(filename):
+    global _snapshot, _path, _stat
     path = os.path.join(os.getcwd(), filename)
-    parser = configparser.ConfigParser()
-    parser.read(path)
-    _parse_config(parser["Display"])
+    stat = _file_stat(path)
+    _snapshot = _read(path)
+    _path = path
+    _stat = stat
+
+
+def reload_if_changed():
+    """re-reads the config file if it changed since it was loaded
+
+    The new snapshot replaces the old one at once and listeners are called with
+    (previous, current). A file that fails to parse keeps the previous snapshot.
+    Returns True if the config was replaced."""
+    global _snapshot, _stat
+    with _reload_lock:
+        stat = _file_stat(_path)
+        if stat is None or stat == _stat:
+            return False
+        _stat = stat
+
+        try:
+            current = _read(_path)
+        except Exception:
+            logging.error("Failed to reload '%s', keeping the previous config:",
+                          _path, exc_info=True)
+            return False
+
+        previous = _snapshot
+        if current == previous:
+            return False
+        _snapshot = current
+        listeners = list(_listeners)
+
+    changed = [f for f in Config._fields if getattr(previous, f) != getattr(current, f)]
+    logging.info("Reloaded '%s', changed: %s", _path, ", ".join(changed))
+    for listener in listeners:
+        try:
+            listener(previous, current)
+        except:
+            logging.error("Error applying reloaded config:", exc_info=True)
+    return True
+
+
+def subscribe(listener):
+    """calls listener(previous, current) whenever the config is reloaded"""
+    _listeners.append(listener)
+
+
+def override(**fields):
+    """replaces fields of the current snapshot without calling listeners, for benchmarks and tools"""
+    global _snapshot
+    with _reload_lock:
+        _snapshot = _snapshot._replace(**fields)
+
+
+def snapshot():
+    """returns the current Config, read it once to use consistent values across a computation"""
+    return _snapshot
+
+
+def window_rules():
+    return _snapshot.window_rules
 
 
 def display_padding():
-    return _data["DisplayPadding"]
+    return _snapshot.display_padding
 
 
 def window_margin():
-    return _data["WindowMargin"]
+    return _snapshot.window_margin
 
 
 def ignored_classnames():
-    return _data["IgnoredClassnames"]
+    return _snapshot.ignored_classnames
 
 
 def partition_split_ratio():
-    return _data["PartitionSplitRatio"]
+    return _snapshot.partition_split_ratio
+
+
+def relayout_delay():
+    return _snapshot.relayout_delay
+
+
+def relayout_max_latency():
+    return _snapshot.relayout_max_latency
+
+
+def max_window_relayouts():
+    return _snapshot.max_window_relayouts
+
+
+def sweep_interval():
+    return _snapshot.sweep_interval
+
+
+def async_positioning():
+    return _snapshot.async_positioning
+
+
+def hung_probe_interval():
+    return _snapshot.hung_probe_interval
+
+
+def hung_probe_timeout():
+    return _snapshot.hung_probe_timeout
+
+
+def slow_placement():
+    return _snapshot.slow_placement
+
+
+def metrics_enabled():
+    return _snapshot.metrics_enabled
+
+
+def metrics_export_path():
+    return _snapshot.metrics_export_path
+
+
+def metrics_export_interval():
+    return _snapshot.metrics_export_interval
+
+
+def log_level():
+    return _snapshot.log_level
+
+
+def log_max_bytes():
+    return _snapshot.log_max_bytes
+
+
+def log_backup_count():
+    return _snapshot.log_backup_count
+
+
+def log_ring_buffer_size():
+    return _snapshot.log_ring_buffer_size
@@ -0,0 +1,123 @@
+import collections
+import logging
+import logging.handlers
+import queue
+import sys
+
+FORMAT = "%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s"
+DATE_FORMAT = "%Y-%m-%d:%H:%M:%S"
+
+_listener = None
+_outputs = []
+_ring_buffer = False
+_level = None  # level written to the outputs, None until configured
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock handler formats every record on the calling thread, which is the
+    WinEvent hook. Log arguments must therefore not change after the call, pass
+    values rather than windows."""
+
+    def prepare(self, record):
+        # the traceback has to be captured while the exception is still current
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last records of any level and dumps the ones the outputs filtered out when an error is logged"""
+
+    def __init__(self, capacity, targets):
+        super().__init__(logging.DEBUG)
+        self.records = collections.deque(maxlen=capacity)
+        self.targets = targets
+
+    def emit(self, record):
+        if record.levelno < logging.ERROR:
+            self.records.append(record)
+            return
+
+        records = list(self.records)
+        self.records.clear()
+        for target in self.targets:
+            dropped = [r for r in records if r.levelno < target.level]
+            if len(dropped) == 0:
+                continue
+            header = logging.makeLogRecord(record.__dict__)
+            header.msg = "Last %d record(s) before the error:"
+            header.args = (len(dropped),)
+            header.exc_text = None
+            target.handle(header)
+            for r in dropped:
+                target.emit(r)
+
+
+def configure(filename, level, max_bytes, backup_count, ring_buffer_size):
+    """routes the root logger through a queue to a background thread writing stdout and a rotating file"""
+    global _listener, _outputs, _ring_buffer, _level
+    stop()
+
+    formatter = logging.Formatter(FORMAT, DATE_FORMAT)
+    outputs = [
+        logging.StreamHandler(sys.stdout),
+        logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    ]
+    for handler in outputs:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+
+    _outputs = outputs
+    _level = level
+    _ring_buffer = ring_buffer_size > 0
+    handlers = list(outputs)
+    if _ring_buffer:
+        # first, so the records before an error are written before the error itself
+        handlers.insert(0, RingBufferHandler(ring_buffer_size, outputs))
+        # the ring buffer needs the records below level, they are not formatted unless dumped
+        root_level = logging.DEBUG
+    else:
+        root_level = level
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(root_level)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def enabled_for(level):
+    """returns True if records of level are written to stdout and the file
+
+    With a ring buffer the root logger passes every record on, guard work done
+    only for a log message with this rather than isEnabledFor()."""
+    if _level is None:
+        return logging.getLogger().isEnabledFor(level)
+    return level >= _level
+
+
+def set_level(level):
+    """changes the level written to stdout and the file while running"""
+    global _level
+    _level = level
+    for handler in _outputs:
+        handler.setLevel(level)
+    if not _ring_buffer:
+        logging.getLogger().setLevel(level)
+
+
+def stop():
+    """writes all queued records and stops the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
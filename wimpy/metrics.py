@@ -0,0 +1,301 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+import wimpy.win32 as win32
+
+# upper bounds in seconds, the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}  # (name, label) -> [bucket counts..., +Inf count, sum]
+_counters = collections.Counter()  # (name, label) -> count
+_relayout_times = collections.deque()  # monotonic times of relayouts in the last minute
+_exporter = None
+
+
+class _NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _Timer(object):
+
+    def __init__(self, name, label):
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        observe(self.name, time.perf_counter() - self.start, self.label)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class InstrumentedBackend(object):
+    """Wraps a backend, counting calls and cumulative time per function"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        func = getattr(self.backend, name)
+        if not callable(func) or name.startswith("_"):
+            return func
+
+        def _timed(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                with _lock:
+                    _counters[("win32_calls_total", name)] += 1
+                    _counters[("win32_call_seconds_total", name)] += elapsed
+
+        # cache the wrapper, __getattr__ is only called for missing attributes
+        setattr(self, name, _timed)
+        return _timed
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """starts collecting metrics and instruments the wimpy.win32 backend"""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    win32.set_backend(InstrumentedBackend(win32.get_backend()))
+    logging.info("Metrics enabled.")
+
+
+def disable():
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    backend = win32.get_backend()
+    if isinstance(backend, InstrumentedBackend):
+        win32.set_backend(backend.backend)
+    stop_export()
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _relayout_times.clear()
+
+
+def increment(name, label=None, amount=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[(name, label)] += amount
+
+
+def observe(name, seconds, label=None):
+    """adds seconds to the histogram name{label}"""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get((name, label))
+        if histogram is None:
+            histogram = _histograms[(name, label)] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+
+
+def timer(name, label=None):
+    """returns a context manager observing its duration, free when metrics are disabled"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, label)
+
+
+def record_relayout():
+    if not _enabled:
+        return
+    now = time.monotonic()
+    with _lock:
+        _relayout_times.append(now)
+        _counters[("relayouts_total", None)] += 1
+        _expire_relayouts(now)
+
+
+def relayouts_per_minute():
+    with _lock:
+        _expire_relayouts(time.monotonic())
+        return len(_relayout_times)
+
+
+def snapshot():
+    """returns all metrics as a JSON serializable dict"""
+    rate = relayouts_per_minute()
+    with _lock:
+        histograms = {}
+        for (name, label), values in sorted(_histograms.items(), key=_sort_key):
+            count = sum(values[:-1])
+            histograms.setdefault(name, {})[label or ""] = {
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], _cumulative(values[:-1]))),
+                "count": count,
+                "sum": values[-1]
+            }
+        counters = {}
+        for (name, label), value in sorted(_counters.items(), key=_sort_key):
+            counters.setdefault(name, {})[label or ""] = value
+    return {
+        "relayouts_per_minute": rate,
+        "counters": counters,
+        "histograms": histograms
+    }
+
+
+def to_openmetrics():
+    data = snapshot()
+    lines = [
+        "# TYPE wimpy_relayouts_per_minute gauge",
+        f"wimpy_relayouts_per_minute {data['relayouts_per_minute']}"
+    ]
+    for name, values in data["counters"].items():
+        metric = f"wimpy_{name[:-len('_total')] if name.endswith('_total') else name}"
+        lines.append(f"# TYPE {metric} counter")
+        for label, value in values.items():
+            lines.append(f"{metric}_total{_labels(name, label)} {value}")
+    for name, values in data["histograms"].items():
+        metric = f"wimpy_{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        for label, histogram in values.items():
+            for bound, count in histogram["buckets"].items():
+                lines.append(
+                    f"{metric}_bucket{_labels(name, label, le=bound)} {count}")
+            lines.append(
+                f"{metric}_count{_labels(name, label)} {histogram['count']}")
+            lines.append(
+                f"{metric}_sum{_labels(name, label)} {histogram['sum']}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """returns a short human readable summary"""
+    data = snapshot()
+    lines = [f"Relayouts per minute: {data['relayouts_per_minute']}"]
+    for label, histogram in data["histograms"].get("relayout_latency_seconds", {}).items():
+        if histogram["count"] > 0:
+            lines.append(
+                f"Relayout latency ({label or 'other'}): {histogram['sum'] / histogram['count'] * 1000:.1f} ms avg, {histogram['count']} total")
+    for label, histogram in data["histograms"].get("dispatch_lag_seconds", {}).items():
+        if histogram["count"] > 0:
+            lines.append(
+                f"Dispatch lag ({label}): {histogram['sum'] / histogram['count'] * 1000:.1f} ms avg, {histogram['count']} total")
+    calls = data["counters"].get("win32_calls_total", {})
+    seconds = data["counters"].get("win32_call_seconds_total", {})
+    for name in sorted(seconds, key=seconds.get, reverse=True)[:5]:
+        lines.append(
+            f"{name}: {calls.get(name, 0)} call(s), {seconds[name] * 1000:.1f} ms")
+    return "\n".join(lines)
+
+
+def start_export(path, interval):
+    """periodically rewrites path with all metrics, as JSON if it ends with .json and OpenMetrics otherwise"""
+    global _exporter
+    stop_export()
+    _exporter = _Exporter(path, interval)
+    _exporter.start()
+
+
+def stop_export():
+    global _exporter
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
+
+
+class _Exporter(object):
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        logging.debug("Exporting metrics to '%s' every %ss.",
+                      self.path, self.interval)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.write()
+
+    def write(self):
+        if self.path.endswith(".json"):
+            content = json.dumps(snapshot(), indent=2)
+        else:
+            content = to_openmetrics()
+        # replace atomically so the monitoring agent never reads a partial file
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, self.path)
+        except OSError:
+            logging.error("Failed to export metrics to '%s':",
+                          self.path, exc_info=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+
+def _expire_relayouts(now):
+    while len(_relayout_times) > 0 and _relayout_times[0] < now - 60:
+        _relayout_times.popleft()
+
+
+def _cumulative(counts):
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+def _labels(name, label, le=None):
+    labels = []
+    if label:
+        key = "function" if name.startswith("win32_") else "event"
+        labels.append(f'{key}="{label}"')
+    if le is not None:
+        labels.append(f'le="{le}"')
+    return "{" + ",".join(labels) + "}" if len(labels) > 0 else ""
+
+
+def _sort_key(item):
+    (name, label), _ = item
+    return (name, label or "")
@@ -0,0 +1,192 @@
+import collections
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+MODES = (SAMPLE, CPROFILE)
+
+DIRECTORY = "profiles"
+DEFAULT_SECONDS = 30
+# seconds between two stack samples
+SAMPLE_INTERVAL = 0.005
+# seconds to wait for profiled threads to hand in their cProfile stats
+COLLECT_TIMEOUT = 5.0
+
+_lock = threading.Lock()
+_threads = {}  # name -> run_on_thread(func), threads profiled by cProfile
+_session = None
+
+
+def register_thread(name, run_on_thread):
+    """adds a thread to cProfile sessions, run_on_thread(func) must run func on that thread soon
+
+    Sampling sessions cover every thread without registration."""
+    with _lock:
+        _threads[name] = run_on_thread
+
+
+def running():
+    return _session is not None
+
+
+def start(seconds=DEFAULT_SECONDS, mode=SAMPLE, directory=DIRECTORY):
+    """profiles for seconds, then writes a file to directory, returns False if a session is already running
+
+    SAMPLE records the stacks of all threads every SAMPLE_INTERVAL into a collapsed
+    stack file (one "thread;outer;...;inner count" line per stack, as read by
+    flamegraph tools). CPROFILE traces every call on the registered threads and
+    writes their merged pstats. Neither interrupts the threads being profiled."""
+    global _session
+    with _lock:
+        if _session is not None:
+            return False
+        if mode == SAMPLE:
+            _session = _SamplingSession(seconds, directory)
+        else:
+            _session = _TracingSession(seconds, directory, dict(_threads))
+    logging.info("Profiling (%s) for %ss.", mode, seconds)
+    _session.start()
+    return True
+
+
+def stop():
+    """ends the running session early, its file is still written"""
+    session = _session
+    if session is not None:
+        session.stop()
+
+
+def _finished(session, path):
+    global _session
+    with _lock:
+        if _session is session:
+            _session = None
+    if path is not None:
+        logging.info("Profile written to '%s'.", path)
+
+
+def _output_path(directory, extension):
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("wimpy-%Y%m%d-%H%M%S") + extension)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _SamplingSession(object):
+
+    def __init__(self, seconds, directory):
+        self.seconds = seconds
+        self.directory = directory
+        self.stacks = collections.Counter()  # collapsed stack -> samples
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _sample(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        own_ident = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self):
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline and not self._stopped.wait(SAMPLE_INTERVAL):
+            self._sample()
+
+        path = None
+        try:
+            path = _output_path(self.directory, ".collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError:
+            logging.error("Failed to write profile:", exc_info=True)
+            path = None
+        _finished(self, path)
+
+
+class _TracingSession(object):
+
+    def __init__(self, seconds, directory, threads):
+        self.seconds = seconds
+        self.directory = directory
+        self.threads = threads  # name -> run_on_thread
+        self.profiles = {}  # name -> cProfile.Profile
+        self._collected = []
+        self._all_collected = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        for name, run_on_thread in self.threads.items():
+            run_on_thread(lambda name=name: self._enable(name))
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _enable(self, name):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # only one profiler may be active at a time on some Python versions
+            logging.warning("Could not profile thread '%s':", name, exc_info=True)
+            return
+        self.profiles[name] = profile
+
+    def _disable(self, name):
+        profile = self.profiles.get(name)
+        if profile is not None:
+            profile.disable()
+        with _lock:
+            self._collected.append(name)
+            if len(self._collected) == len(self.threads):
+                self._all_collected.set()
+
+    def _run(self):
+        self._stopped.wait(self.seconds)
+        if len(self.threads) == 0:
+            self._all_collected.set()
+        for name, run_on_thread in self.threads.items():
+            run_on_thread(lambda name=name: self._disable(name))
+        if not self._all_collected.wait(COLLECT_TIMEOUT):
+            logging.warning("Profiled threads did not answer, writing the stats collected so far.")
+
+        path = None
+        with _lock:
+            profiles = [self.profiles[name] for name in self._collected if name in self.profiles]
+        if len(profiles) > 0:
+            try:
+                stats = pstats.Stats(profiles[0])
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                path = _output_path(self.directory, ".pstats")
+                stats.dump_stats(path)
+            except OSError:
+                logging.error("Failed to write profile:", exc_info=True)
+                path = None
+        else:
+            logging.warning("No thread was profiled.")
+        _finished(self, path)
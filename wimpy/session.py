@@ -0,0 +1,38 @@
+import json
+import logging
+import os
+
+# bumped whenever the layout of the file changes, other versions are ignored
+VERSION = 1
+
+
+def load(path):
+    """returns the session saved at path, or None if there is none or it cannot be used"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            session = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logging.warning("Ignoring unreadable session '%s':",
+                        path, exc_info=True)
+        return None
+
+    if not isinstance(session, dict) or session.get("version") != VERSION:
+        logging.info("Ignoring session '%s' of another version.", path)
+        return None
+    return session
+
+
+def save(path, session):
+    """writes session to path, replacing the previous file only once it is complete"""
+    session = dict(session, version=VERSION)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(session, file, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except OSError:
+        logging.error("Failed to save session '%s':", path, exc_info=True)
+        return False
+    return True
@@ -1,45 +1,162 @@
-import logging
-import pywintypes
-import win32api
-import win32con
-import win32gui
+# constants (WinUser.h)
+EVENT_MIN = 0x00000001
+EVENT_MAX = 0x7FFFFFFF
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MOVESIZESTART = 0x000A
+EVENT_SYSTEM_MOVESIZEEND = 0x000B
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_REORDER = 0x8004
+EVENT_OBJECT_STATECHANGE = 0x800A
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+
+EVENT_NAMES = {
+    EVENT_SYSTEM_FOREGROUND: "foreground",
+    EVENT_SYSTEM_MOVESIZESTART: "movesize_start",
+    EVENT_SYSTEM_MOVESIZEEND: "movesize_end",
+    EVENT_SYSTEM_MINIMIZESTART: "minimize_start",
+    EVENT_SYSTEM_MINIMIZEEND: "minimize_end",
+    EVENT_OBJECT_CREATE: "object_create",
+    EVENT_OBJECT_DESTROY: "object_destroy",
+    EVENT_OBJECT_SHOW: "object_show",
+    EVENT_OBJECT_HIDE: "object_hide",
+    EVENT_OBJECT_REORDER: "object_reorder",
+    EVENT_OBJECT_STATECHANGE: "object_statechange",
+    EVENT_OBJECT_LOCATIONCHANGE: "object_locationchange",
+    EVENT_OBJECT_NAMECHANGE: "object_namechange"
+}
+
+OBJID_WINDOW = 0
+
+WM_NULL = 0x0000
+WM_QUIT = 0x0012
+WM_APP = 0x8000
+
+HWND_TOPMOST = -1
+HWND_NOTOPMOST = -2
+
+SWP_NOSIZE = 0x0001
+SWP_NOMOVE = 0x0002
+SWP_NOZORDER = 0x0004
+SWP_NOREDRAW = 0x0008
+SWP_NOACTIVATE = 0x0010
+SWP_NOOWNERZORDER = 0x0200
+SWP_ASYNCWINDOWPOS = 0x4000
+
+SMTO_ABORTIFHUNG = 0x0002
+
+WS_OVERLAPPED = 0x00000000
+WS_POPUP = 0x80000000
+WS_CHILD = 0x40000000
+WS_MINIMIZE = 0x20000000
+WS_VISIBLE = 0x10000000
+WS_DISABLED = 0x08000000
+WS_CLIPSIBLINGS = 0x04000000
+WS_CLIPCHILDREN = 0x02000000
+WS_MAXIMIZE = 0x01000000
+WS_CAPTION = 0x00C00000
+WS_BORDER = 0x00800000
+WS_DLGFRAME = 0x00400000
+WS_VSCROLL = 0x00200000
+WS_HSCROLL = 0x00100000
+WS_SYSMENU = 0x00080000
+WS_THICKFRAME = 0x00040000
+WS_GROUP = 0x00020000
+WS_TABSTOP = 0x00010000
+WS_MINIMIZEBOX = 0x00020000
+WS_MAXIMIZEBOX = 0x00010000
+WS_TILED = WS_OVERLAPPED
+WS_ICONIC = WS_MINIMIZE
+WS_SIZEBOX = WS_THICKFRAME
+WS_OVERLAPPEDWINDOW = WS_OVERLAPPED | WS_CAPTION | WS_SYSMENU | \
+    WS_THICKFRAME | WS_MINIMIZEBOX | WS_MAXIMIZEBOX
+WS_TILEDWINDOW = WS_OVERLAPPEDWINDOW
+WS_POPUPWINDOW = WS_POPUP | WS_BORDER | WS_SYSMENU
+WS_CHILDWINDOW = WS_CHILD
+
+WS_EX_DLGMODALFRAME = 0x00000001
+WS_EX_NOPARENTNOTIFY = 0x00000004
+WS_EX_TOPMOST = 0x00000008
+WS_EX_ACCEPTFILES = 0x00000010
+WS_EX_TRANSPARENT = 0x00000020
+WS_EX_MDICHILD = 0x00000040
+WS_EX_TOOLWINDOW = 0x00000080
+WS_EX_WINDOWEDGE = 0x00000100
+WS_EX_CLIENTEDGE = 0x00000200
+WS_EX_CONTEXTHELP = 0x00000400
+WS_EX_RIGHT = 0x00001000
+WS_EX_LEFT = 0x00000000
+WS_EX_RTLREADING = 0x00002000
+WS_EX_LTRREADING = 0x00000000
+WS_EX_LEFTSCROLLBAR = 0x00004000
+WS_EX_RIGHTSCROLLBAR = 0x00000000
+WS_EX_CONTROLPARENT = 0x00010000
+WS_EX_STATICEDGE = 0x00020000
+WS_EX_APPWINDOW = 0x00040000
+WS_EX_OVERLAPPEDWINDOW = WS_EX_WINDOWEDGE | WS_EX_CLIENTEDGE
+WS_EX_PALETTEWINDOW = WS_EX_WINDOWEDGE | WS_EX_TOOLWINDOW | WS_EX_TOPMOST
+WS_EX_LAYERED = 0x00080000
+WS_EX_NOINHERITLAYOUT = 0x00100000
+WS_EX_LAYOUTRTL = 0x00400000
+WS_EX_COMPOSITED = 0x02000000
+WS_EX_NOACTIVATE = 0x08000000
+
+# all calls go through the active backend (see wimpy.Backend)
+_backend = None
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+def get_backend():
+    return _backend
 
 
 def EnumDisplayMonitors():
-    hwnds = []
-    for hwnd, _, _ in win32api.EnumDisplayMonitors():
-        hwnds.append(hwnd)
+    return _backend.EnumDisplayMonitors()
 
-    return hwnds
 
+def GetMonitorInfo(hmonitor):
+    return _backend.GetMonitorInfo(hmonitor)
+
+
+def MonitorFromPoint(point):
+    return _backend.MonitorFromPoint(point)
 
-def EnumWindows():
-    def _cb(hwnd, handles):
-        handles.append(hwnd)
 
-    hwnds = []
-    win32gui.EnumWindows(_cb, hwnds)
-    return hwnds
+def MonitorFromWindow(hwnd):
+    return _backend.MonitorFromWindow(hwnd)
+
+
+def EnumWindows():
+    return _backend.EnumWindows()
 
 
 def GetForegroundWindow():
-    return win32gui.GetForegroundWindow()
+    return _backend.GetForegroundWindow()
 
 
 def GetWindowClassName(hwnd):
-    return win32gui.GetClassName(hwnd)
+    return _backend.GetWindowClassName(hwnd)
 
 
 def GetWindowRect(hwnd):
-    return win32gui.GetWindowRect(hwnd)
+    return _backend.GetWindowRect(hwnd)
 
 
 def GetWindowStyles(hwnd):
-    return win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
+    return _backend.GetWindowStyles(hwnd)
 
 
 def GetWindowExStyles(hwnd):
-    return win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
+    return _backend.GetWindowExStyles(hwnd)
 
 
 def GetWindowStyleMap(hwnd):
@@ -56,85 +173,143 @@ def GetWindowStyleMap(hwnd):
 
     # styles
     # https://docs.microsoft.com/en-us/windows/win32/winmsg/window-styles
-    _append_style("border", win32con.WS_BORDER)
-    _append_style("caption", win32con.WS_CAPTION)
-    _append_style("child", win32con.WS_CHILD)
-    _append_style("child_window", win32con.WS_CHILDWINDOW)
-    _append_style("clip_children", win32con.WS_CLIPCHILDREN)
-    _append_style("clip_siblings", win32con.WS_CLIPSIBLINGS)
-    _append_style("disabled", win32con.WS_DISABLED)
-    _append_style("dlg_frame", win32con.WS_DLGFRAME)
-    _append_style("group", win32con.WS_GROUP)
-    _append_style("h_scroll", win32con.WS_HSCROLL)
-    _append_style("iconic", win32con.WS_ICONIC)
-    _append_style("maximize", win32con.WS_MAXIMIZE)
-    _append_style("maximize_box", win32con.WS_MAXIMIZEBOX)
-    _append_style("minimize", win32con.WS_MINIMIZE)
-    _append_style("minimize_box", win32con.WS_MINIMIZEBOX)
-    _append_style("overlapped", win32con.WS_OVERLAPPED)
-    _append_style("overlapped_window", win32con.WS_OVERLAPPEDWINDOW)
-    _append_style("popup", win32con.WS_POPUP)
-    _append_style("popup_window", win32con.WS_POPUPWINDOW)
-    _append_style("size_box", win32con.WS_SIZEBOX)
-    _append_style("sys_menu", win32con.WS_SYSMENU)
-    _append_style("tab_stop", win32con.WS_TABSTOP)
-    _append_style("thick_frame", win32con.WS_THICKFRAME)
-    _append_style("tiled", win32con.WS_TILED)
-    _append_style("tiled_window", win32con.WS_TILEDWINDOW)
-    _append_style("visible", win32con.WS_VISIBLE)
-    _append_style("v_scroll", win32con.WS_VSCROLL)
+    _append_style("border", WS_BORDER)
+    _append_style("caption", WS_CAPTION)
+    _append_style("child", WS_CHILD)
+    _append_style("child_window", WS_CHILDWINDOW)
+    _append_style("clip_children", WS_CLIPCHILDREN)
+    _append_style("clip_siblings", WS_CLIPSIBLINGS)
+    _append_style("disabled", WS_DISABLED)
+    _append_style("dlg_frame", WS_DLGFRAME)
+    _append_style("group", WS_GROUP)
+    _append_style("h_scroll", WS_HSCROLL)
+    _append_style("iconic", WS_ICONIC)
+    _append_style("maximize", WS_MAXIMIZE)
+    _append_style("maximize_box", WS_MAXIMIZEBOX)
+    _append_style("minimize", WS_MINIMIZE)
+    _append_style("minimize_box", WS_MINIMIZEBOX)
+    _append_style("overlapped", WS_OVERLAPPED)
+    _append_style("overlapped_window", WS_OVERLAPPEDWINDOW)
+    _append_style("popup", WS_POPUP)
+    _append_style("popup_window", WS_POPUPWINDOW)
+    _append_style("size_box", WS_SIZEBOX)
+    _append_style("sys_menu", WS_SYSMENU)
+    _append_style("tab_stop", WS_TABSTOP)
+    _append_style("thick_frame", WS_THICKFRAME)
+    _append_style("tiled", WS_TILED)
+    _append_style("tiled_window", WS_TILEDWINDOW)
+    _append_style("visible", WS_VISIBLE)
+    _append_style("v_scroll", WS_VSCROLL)
 
     # extended styles
     # https://docs.microsoft.com/en-us/windows/win32/winmsg/extended-window-styles
-    _append_exstyle("accept_files", win32con.WS_EX_ACCEPTFILES)
-    _append_exstyle("app_window", win32con.WS_EX_APPWINDOW)
-    _append_exstyle("client_edge", win32con.WS_EX_CLIENTEDGE)
-    _append_exstyle("composited", win32con.WS_EX_COMPOSITED)
-    _append_exstyle("context_help", win32con.WS_EX_CONTEXTHELP)
-    _append_exstyle("control_parent", win32con.WS_EX_CONTROLPARENT)
-    _append_exstyle("dlg_modal_frame", win32con.WS_EX_DLGMODALFRAME)
-    _append_exstyle("layered", win32con.WS_EX_LAYERED)
-    _append_exstyle("layout_rtl", win32con.WS_EX_LAYOUTRTL)
-    _append_exstyle("left", win32con.WS_EX_LEFT)
-    _append_exstyle("left_scrollbar", win32con.WS_EX_LEFTSCROLLBAR)
-    _append_exstyle("ltr_reading", win32con.WS_EX_LTRREADING)
-    _append_exstyle("mdi_child", win32con.WS_EX_MDICHILD)
-    _append_exstyle("no_activate", win32con.WS_EX_NOACTIVATE)
-    _append_exstyle("no_inherit_layout", win32con.WS_EX_NOINHERITLAYOUT)
-    _append_exstyle("no_parent_notify", win32con.WS_EX_NOPARENTNOTIFY)
-    _append_exstyle("overlapped_window", win32con.WS_EX_OVERLAPPEDWINDOW)
-    _append_exstyle("palette_window", win32con.WS_EX_PALETTEWINDOW)
-    _append_exstyle("right", win32con.WS_EX_RIGHT)
-    _append_exstyle("right_scrollbar", win32con.WS_EX_RIGHTSCROLLBAR)
-    _append_exstyle("rtl_reading", win32con.WS_EX_RTLREADING)
-    _append_exstyle("static_edge", win32con.WS_EX_STATICEDGE)
-    _append_exstyle("tool_window", win32con.WS_EX_TOOLWINDOW)
-    _append_exstyle("topmost", win32con.WS_EX_TOPMOST)
-    _append_exstyle("transparent", win32con.WS_EX_TRANSPARENT)
-    _append_exstyle("window_edge", win32con.WS_EX_WINDOWEDGE)
+    _append_exstyle("accept_files", WS_EX_ACCEPTFILES)
+    _append_exstyle("app_window", WS_EX_APPWINDOW)
+    _append_exstyle("client_edge", WS_EX_CLIENTEDGE)
+    _append_exstyle("composited", WS_EX_COMPOSITED)
+    _append_exstyle("context_help", WS_EX_CONTEXTHELP)
+    _append_exstyle("control_parent", WS_EX_CONTROLPARENT)
+    _append_exstyle("dlg_modal_frame", WS_EX_DLGMODALFRAME)
+    _append_exstyle("layered", WS_EX_LAYERED)
+    _append_exstyle("layout_rtl", WS_EX_LAYOUTRTL)
+    _append_exstyle("left", WS_EX_LEFT)
+    _append_exstyle("left_scrollbar", WS_EX_LEFTSCROLLBAR)
+    _append_exstyle("ltr_reading", WS_EX_LTRREADING)
+    _append_exstyle("mdi_child", WS_EX_MDICHILD)
+    _append_exstyle("no_activate", WS_EX_NOACTIVATE)
+    _append_exstyle("no_inherit_layout", WS_EX_NOINHERITLAYOUT)
+    _append_exstyle("no_parent_notify", WS_EX_NOPARENTNOTIFY)
+    _append_exstyle("overlapped_window", WS_EX_OVERLAPPEDWINDOW)
+    _append_exstyle("palette_window", WS_EX_PALETTEWINDOW)
+    _append_exstyle("right", WS_EX_RIGHT)
+    _append_exstyle("right_scrollbar", WS_EX_RIGHTSCROLLBAR)
+    _append_exstyle("rtl_reading", WS_EX_RTLREADING)
+    _append_exstyle("static_edge", WS_EX_STATICEDGE)
+    _append_exstyle("tool_window", WS_EX_TOOLWINDOW)
+    _append_exstyle("topmost", WS_EX_TOPMOST)
+    _append_exstyle("transparent", WS_EX_TRANSPARENT)
+    _append_exstyle("window_edge", WS_EX_WINDOWEDGE)
 
     return style_map
 
 
 def GetWindowText(hwnd):
-    return win32gui.GetWindowText(hwnd)
+    return _backend.GetWindowText(hwnd)
+
+
+def GetWindowProcessId(hwnd):
+    return _backend.GetWindowProcessId(hwnd)
+
+
+def GetProcessImageName(pid):
+    return _backend.GetProcessImageName(pid)
 
 
 def IsIconic(hwnd):
-    return win32gui.IsIconic(hwnd)
+    return _backend.IsIconic(hwnd)
+
+
+def IsHungAppWindow(hwnd):
+    return _backend.IsHungAppWindow(hwnd)
+
+
+def IsWindow(hwnd):
+    return _backend.IsWindow(hwnd)
 
 
 def IsWindowVisible(hwnd):
-    return win32gui.IsWindowVisible(hwnd)
+    return _backend.IsWindowVisible(hwnd)
+
+
+def IsZoomed(hwnd):
+    return _backend.IsZoomed(hwnd)
 
 
 def MoveWindow(hwnd, x, y, cx, cy, repaint):
-    try:
-        return win32gui.MoveWindow(hwnd, x, y, cx, cy, repaint)
-    except pywintypes.error as err:
-        winerr, funcname, message = err.args
-        logging.error(f"{funcname} ({winerr}): {message}")
+    return _backend.MoveWindow(hwnd, x, y, cx, cy, repaint)
 
 
 def SetWindowPos(hwnd, hwnd_insert_after, x, y, cx, cy, u_flags):
-    return win32gui.SetWindowPos(hwnd, hwnd_insert_after, x, y, cx, cy, u_flags)
+    return _backend.SetWindowPos(hwnd, hwnd_insert_after, x, y, cx, cy, u_flags)
+
+
+def SendMessageTimeout(hwnd, message, timeout):
+    """sends message with SMTO_ABORTIFHUNG, returns True if the window processed it within timeout ms"""
+    return _backend.SendMessageTimeout(hwnd, message, timeout)
+
+
+def DeferWindowPositions(positions):
+    """moves all windows in a single BeginDeferWindowPos/EndDeferWindowPos transaction
+
+    positions is a list of (hwnd, (l, t, r, b)); windows are repainted once, when the transaction is committed"""
+    if len(positions) == 0:
+        return True
+    return _backend.DeferWindowPositions(positions)
+
+
+def GetTickCount():
+    return _backend.GetTickCount()
+
+
+def SetWinEventHook(event_min, event_max, callback, err_callback=None):
+    return _backend.SetWinEventHook(event_min, event_max, callback, err_callback)
+
+
+def UnhookWinEvent(hook):
+    return _backend.UnhookWinEvent(hook)
+
+
+def RunMessageLoop(on_start, on_thread_message, on_stop):
+    return _backend.RunMessageLoop(on_start, on_thread_message, on_stop)
+
+
+def PostThreadMessage(thread_id, message):
+    return _backend.PostThreadMessage(thread_id, message)
+
+
+try:
+    from wimpy.NativeBackend import NativeBackend
+    set_backend(NativeBackend())
+except ImportError:
+    # pywin32 is only available on Windows, set_backend has to be called explicitly
+    pass